@@ -0,0 +1,75 @@
+"""
+Shared test fixtures.
+The fixtures are session-scoped, so the connections and .env settings
+are created once per test session (or once per worker with pytest-xdist).
+These fixtures rely on the vBase connection and AWS settings stored in the .env file.
+"""
+
+from typing import Any, Iterator, List, Mapping, Optional, Tuple
+import boto3
+from moto import mock_aws
+import pytest
+
+from vbase import (
+    VBaseClient,
+    VBaseClientTest,
+    VBaseStringObject,
+)
+
+from tools.utils import (
+    get_s3_handle,
+    load_env,
+)
+
+
+@pytest.fixture(scope="session")
+def env_vars() -> Mapping[str, Optional[str]]:
+    """
+    The environment variables containing static configuration.
+    """
+    return load_env()
+
+
+@pytest.fixture(scope="session")
+def vbc() -> VBaseClient:
+    """
+    The vBase client configured using the .env settings.
+    """
+    return VBaseClient.create_instance_from_env(".env")
+
+
+@pytest.fixture(scope="session")
+def vbc_test() -> VBaseClientTest:
+    """
+    The vBase client for the test contract configured using the .env settings.
+    Tests that need to create test commitments should use this client.
+    """
+    return VBaseClientTest.create_instance_from_env(".env")
+
+
+@pytest.fixture(scope="session")
+def s3(env_vars: Mapping[str, Optional[str]]) -> Any:
+    """
+    The AWS S3 boto client object using the AWS Access Key defined in .env.
+    """
+    return get_s3_handle(True, env_vars)
+
+
+@pytest.fixture
+def mock_s3_bucket() -> Iterator[Tuple[Any, List[str]]]:
+    """
+    A mock S3 bucket named "test-bucket" holding 5 objects
+    with keys "test/test_{i}.txt" and contents "test {i}".
+    Tests using the mock bucket do not require vBase or AWS settings.
+    Yields the S3 boto client object and the object CIDs in the key order.
+    """
+    with mock_aws():
+        s3_mock = boto3.client("s3", region_name="us-east-1")
+        s3_mock.create_bucket(Bucket="test-bucket")
+        for i in range(5):
+            s3_mock.put_object(
+                Bucket="test-bucket", Key=f"test/test_{i}.txt", Body=f"test {i}"
+            )
+        yield s3_mock, [
+            VBaseStringObject.get_cid_for_data(f"test {i}") for i in range(5)
+        ]
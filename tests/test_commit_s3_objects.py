@@ -7,35 +7,42 @@ These test rely on the vBase connection and AWS settings stored in the .env file
 
 import logging
 import pprint
+from typing import List
 import unittest
-from dotenv import dotenv_values
+from unittest.mock import patch
+import pytest
 
-from vbase import (
-    get_default_logger,
-    VBaseClient,
-)
+from vbase import get_default_logger
 
 from tools.commit_s3_objects import (
+    _AdaptiveBatchCommitter,
+    CommitmentError,
     build_argument_parser,
+    commit_s3_object_list,
     commit_s3_objects,
 )
+from tools.utils import get_all_matching_objects
 
 
 _LOG = get_default_logger(__name__)
 _LOG.setLevel(logging.INFO)
 
 
+# The tests commit to the same dataset, so they must run on the same xdist worker.
+@pytest.mark.xdist_group("chain")
 class TestCommitS3Objects(unittest.TestCase):
     """
     Test S3 object commitments.
     """
 
-    def setUp(self):
+    @pytest.fixture(autouse=True)
+    def _set_up(self, vbc, env_vars):
         """
-        Set up the tests.
+        Set up the tests using the shared session fixtures.
         """
-        self.vbc = VBaseClient.create_instance_from_env(".env")
-        self.env_vars = dotenv_values(".env")
+        # pylint: disable=attribute-defined-outside-init
+        self.vbc = vbc
+        self.env_vars = env_vars
 
     def test_commit_test_1(self):
         """
@@ -51,7 +58,7 @@ class TestCommitS3Objects(unittest.TestCase):
                 "--use_aws_access_key",
             ]
         )
-        _LOG.info(f"Testing args:\n{pprint.pformat(vars(args))}")
+        _LOG.info("Testing args:\n%s", pprint.pformat(vars(args)))
         commitment_receipt = commit_s3_objects(args, self.env_vars)[0]
         assert self.vbc.verify_user_object(
             commitment_receipt["user"],
@@ -74,7 +81,7 @@ class TestCommitS3Objects(unittest.TestCase):
                 "--verbose",
             ]
         )
-        _LOG.info(f"Testing args:\n{pprint.pformat(vars(args))}")
+        _LOG.info("Testing args:\n%s", pprint.pformat(vars(args)))
         commitment_receipt = commit_s3_objects(args, self.env_vars)[0]
         assert self.vbc.verify_user_object(
             commitment_receipt["user"],
@@ -96,7 +103,7 @@ class TestCommitS3Objects(unittest.TestCase):
                 "--use_aws_access_key",
             ]
         )
-        _LOG.info(f"Testing args:\n{pprint.pformat(vars(args))}")
+        _LOG.info("Testing args:\n%s", pprint.pformat(vars(args)))
         commitment_receipts = commit_s3_objects(args, self.env_vars)
         for commitment_receipt in commitment_receipts:
             assert self.vbc.verify_user_object(
@@ -119,7 +126,7 @@ class TestCommitS3Objects(unittest.TestCase):
                 "--use_aws_access_key",
             ]
         )
-        _LOG.info(f"Testing args:\n{pprint.pformat(vars(args))}")
+        _LOG.info("Testing args:\n%s", pprint.pformat(vars(args)))
         commitment_receipts = commit_s3_objects(args, self.env_vars)
         for commitment_receipt in commitment_receipts:
             assert self.vbc.verify_user_object(
@@ -143,7 +150,7 @@ class TestCommitS3Objects(unittest.TestCase):
                 "--verbose",
             ]
         )
-        _LOG.info(f"Testing args:\n{pprint.pformat(vars(args))}")
+        _LOG.info("Testing args:\n%s", pprint.pformat(vars(args)))
         commitment_receipts = commit_s3_objects(args, self.env_vars)
         for commitment_receipt in commitment_receipts:
             assert self.vbc.verify_user_object(
@@ -153,5 +160,151 @@ class TestCommitS3Objects(unittest.TestCase):
             )
 
 
+class _StubBatchVBaseClient:
+    """
+    vBase client stub committing object CIDs in memory.
+    Batches larger than max_batch fail gas estimation,
+    and CIDs in fail_cids fail with the given error.
+    """
+
+    def __init__(
+        self,
+        max_batch: int,
+        fail_cids=(),
+        error=ValueError("exceeds block gas limit"),
+    ):
+        self.max_batch = max_batch
+        self.fail_cids = set(fail_cids)
+        self.error = error
+        self.calls: List[int] = []
+
+    def add_set_objects_batch(self, set_cid: str, object_cids: List[str]) -> List[dict]:
+        self.calls.append(len(object_cids))
+        if len(object_cids) > self.max_batch:
+            raise ValueError("gas required exceeds allowance")
+        if self.fail_cids.intersection(object_cids):
+            raise self.error
+        return [{"setCid": set_cid, "objectCid": cid} for cid in object_cids]
+
+
+# Backoff delays are not needed for the stub client.
+@patch("time.sleep")
+class TestAdaptiveBatchCommitter(unittest.TestCase):
+    """
+    Test adaptive commitment batch sizing.
+    These tests do not require vBase or AWS settings.
+    """
+
+    def test_split_short_batch(self, sleep):
+        """
+        Test that a batch shorter than the target is split rather than resubmitted.
+        """
+        vbc = _StubBatchVBaseClient(max_batch=10)
+        object_cids = [f"0x{i}" for i in range(30)]
+        receipts = _AdaptiveBatchCommitter(vbc, "0xset", 100).commit(object_cids)
+        assert [r["objectCid"] for r in receipts] == object_cids
+        assert vbc.calls[:3] == [30, 15, 7]
+        assert sleep.call_count == 2
+
+    def test_grow_after_successes(self, sleep):
+        """
+        Test that the batch size grows back after consecutive successes.
+        """
+        vbc = _StubBatchVBaseClient(max_batch=100)
+        committer = _AdaptiveBatchCommitter(vbc, "0xset", 40)
+        committer.current_batch = 10
+        committer.commit([f"0x{i}" for i in range(60)])
+        assert vbc.calls == [10, 10, 10, 20, 10]
+        sleep.assert_not_called()
+
+    def test_skip_failing_object(self, sleep):
+        """
+        Test that an object failing on its own is skipped after retries with backoff.
+        """
+        vbc = _StubBatchVBaseClient(max_batch=100, fail_cids=["0x3"])
+        object_cids = [f"0x{i}" for i in range(8)]
+        receipts = _AdaptiveBatchCommitter(vbc, "0xset", 8).commit(object_cids)
+        assert [r["objectCid"] for r in receipts] == object_cids[:3] + object_cids[4:]
+        # The retries of the failing object back off exponentially.
+        assert [c.args[0] for c in sleep.call_args_list[-3:]] == [1, 2, 4]
+
+    def test_no_retry_after_other_errors(self, sleep):
+        """
+        Test that a batch failing for reasons other than its size is not resubmitted,
+        since the transaction may have been sent.
+        """
+        vbc = _StubBatchVBaseClient(
+            max_batch=100, fail_cids=["0x3"], error=TimeoutError("receipt timeout")
+        )
+        object_cids = [f"0x{i}" for i in range(8)]
+        committer = _AdaptiveBatchCommitter(vbc, "0xset", 4)
+        receipts = committer.commit(object_cids)
+        assert [r["objectCid"] for r in receipts] == object_cids[4:]
+        assert vbc.calls == [4, 4]
+        assert sleep.call_count == 1
+        assert committer.current_batch == 4
+
+    def test_abort_after_account_errors(self, sleep):
+        """
+        Test that an account error aborts the commitments without retries
+        and keeps the receipts for the committed objects.
+        """
+        vbc = _StubBatchVBaseClient(
+            max_batch=100,
+            fail_cids=["0x5"],
+            error=ValueError("insufficient funds for gas * price + value"),
+        )
+        object_cids = [f"0x{i}" for i in range(12)]
+        with self.assertRaisesRegex(CommitmentError, "insufficient funds") as cm:
+            _AdaptiveBatchCommitter(vbc, "0xset", 4).commit(object_cids)
+        assert [r["objectCid"] for r in cm.exception.commitment_receipts] == (
+            object_cids[:4]
+        )
+        assert vbc.calls == [4, 4]
+        sleep.assert_not_called()
+
+
+@patch("time.sleep")
+class TestCommitS3ObjectList(unittest.TestCase):
+    """
+    Test commitments for listed S3 objects.
+    These tests use a mock S3 bucket and do not require vBase or AWS settings.
+    """
+
+    @pytest.fixture(autouse=True)
+    def _set_up(self, mock_s3_bucket):
+        """
+        Set up the tests using the shared mock bucket.
+        """
+        # pylint: disable=attribute-defined-outside-init
+        self.s3, self.object_cids = mock_s3_bucket
+
+    def _commit(self, vbc: _StubBatchVBaseClient) -> List[dict]:
+        args = build_argument_parser().parse_args(
+            ["--dataset_name=test", "--bucket=test-bucket", "--key_prefix=test/"]
+        )
+        objs = get_all_matching_objects(self.s3, "test-bucket", key_prefix="test/")
+        return commit_s3_object_list(vbc, self.s3, args, objs)
+
+    def test_commit_all(self, _):
+        """
+        Test that all listed objects are committed.
+        """
+        receipts = self._commit(_StubBatchVBaseClient(max_batch=100))
+        assert [r["objectCid"] for r in receipts] == self.object_cids
+
+    def test_partial_commit(self, _):
+        """
+        Test that skipped objects are reported as an error
+        that keeps the receipts for the committed objects.
+        """
+        vbc = _StubBatchVBaseClient(max_batch=100, fail_cids=[self.object_cids[2]])
+        with self.assertRaisesRegex(CommitmentError, "1 of 5 objects") as cm:
+            self._commit(vbc)
+        assert [r["objectCid"] for r in cm.exception.commitment_receipts] == (
+            self.object_cids[:2] + self.object_cids[3:]
+        )
+
+
 if __name__ == "__main__":
-    unittest.main()
+    pytest.main([__file__])
@@ -0,0 +1,56 @@
+"""
+Tests of the .env configuration helpers.
+These tests do not require vBase or AWS settings.
+"""
+
+import os
+import stat
+import tempfile
+import unittest
+
+from tools.config_env import (
+    index_env_lines,
+    set_env_var,
+    write_env_file,
+)
+
+
+class TestConfigEnv(unittest.TestCase):
+    """
+    Test .env file updates.
+    """
+
+    def test_set_env_var(self):
+        """
+        Test that variables are replaced by exact name or appended.
+        """
+        lines = ['# VBASE_API_KEY = "comment"\n', 'VBASE_API_KEY_OLD="a"\n', "A=1"]
+        line_index = index_env_lines(lines)
+        assert line_index == {"VBASE_API_KEY_OLD": 1, "A": 2}
+        set_env_var(lines, line_index, "A", "2")
+        set_env_var(lines, line_index, "VBASE_API_KEY", "key")
+        assert lines == [
+            '# VBASE_API_KEY = "comment"\n',
+            'VBASE_API_KEY_OLD="a"\n',
+            'A = "2"\n',
+            'VBASE_API_KEY = "key"\n',
+        ]
+
+    def test_write_env_file_keeps_mode(self):
+        """
+        Test that rewriting .env keeps its permissions and leaves no temporary files.
+        """
+        with tempfile.TemporaryDirectory() as dir_path:
+            file_path = os.path.join(dir_path, ".env")
+            with open(file_path, "w", encoding="utf-8") as file:
+                file.write("A=1\n")
+            os.chmod(file_path, 0o600)
+            write_env_file(file_path, ['A = "2"\n'])
+            assert stat.S_IMODE(os.stat(file_path).st_mode) == 0o600
+            with open(file_path, encoding="utf-8") as file:
+                assert file.read() == 'A = "2"\n'
+            assert os.listdir(dir_path) == [".env"]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,271 @@
+"""
+Tests of the validityBase (vBase) tools utilities.
+These tests use a mock S3 bucket and do not require vBase or AWS settings.
+"""
+
+import hashlib
+import io
+import itertools
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+import boto3
+from botocore.exceptions import ClientError
+from botocore.response import StreamingBody
+from moto import mock_aws
+
+from vbase import VBaseStringObject
+
+from tools.utils import (
+    get_cached_object_cid,
+    get_cached_object_cids,
+    get_cid_for_stream,
+    get_env_int,
+    get_glob_literal_prefix,
+    open_cid_cache,
+    prefetch,
+    put_cached_object_cids,
+    read_s3_object_cid,
+)
+
+
+_BUCKET_NAME = "test-bucket"
+
+
+class TestGetEnvInt(unittest.TestCase):
+    """
+    Test integer settings from environment variables.
+    """
+
+    def test_get_env_int(self):
+        """
+        Test that invalid values fall back to the default with a warning.
+        """
+        with patch.dict(os.environ, {"VBASE_TEST_INT": "4"}):
+            assert get_env_int("VBASE_TEST_INT", 10) == 4
+        assert get_env_int("VBASE_TEST_INT", 10) == 10
+        for value in ["abc", "0", "-1", ""]:
+            with patch.dict(os.environ, {"VBASE_TEST_INT": value}):
+                with self.assertLogs("tools.utils", "WARNING"):
+                    assert get_env_int("VBASE_TEST_INT", 10) == 10
+
+
+class TestPrefetch(unittest.TestCase):
+    """
+    Test iteration on a background thread.
+    """
+
+    def test_prefetch(self):
+        """
+        Test that the items are produced in order.
+        """
+        assert list(prefetch(range(100), maxsize=10)) == list(range(100))
+        assert not list(prefetch([], maxsize=10))
+
+    def test_prefetch_exception(self):
+        """
+        Test that a producer exception is raised after the items produced before it.
+        """
+
+        def _produce():
+            yield 1
+            yield 2
+            raise ValueError("listing failed")
+
+        items = []
+        with self.assertRaisesRegex(ValueError, "listing failed"):
+            for item in prefetch(_produce(), maxsize=10):
+                items.append(item)
+        assert items == [1, 2]
+
+    def test_prefetch_abandoned(self):
+        """
+        Test that an abandoned iteration stops the producer at the queue size
+        and does not block.
+        """
+        produced = []
+        blocked = threading.Event()
+
+        def _produce():
+            for i in itertools.count():
+                produced.append(i)
+                if len(produced) > 3:
+                    blocked.set()
+                yield i
+
+        items = prefetch(_produce(), maxsize=2)
+        assert next(items) == 0
+        items.close()
+        # The producer blocks with a full queue rather than running ahead.
+        assert blocked.wait(timeout=5)
+        assert len(produced) <= 5
+
+
+class TestGetGlobLiteralPrefix(unittest.TestCase):
+    """
+    Test literal prefixes of key patterns.
+    """
+
+    def test_get_glob_literal_prefix(self):
+        """
+        Test that the prefix ends before the first wildcard character.
+        """
+        assert get_glob_literal_prefix("data/2024-*.csv") == "data/2024-"
+        assert get_glob_literal_prefix("data/file?.csv") == "data/file"
+        assert get_glob_literal_prefix("data/[ab]/*.csv") == "data/"
+        assert get_glob_literal_prefix("*.csv") == ""
+        assert get_glob_literal_prefix("data/file.csv") == "data/file.csv"
+
+
+class TestCidCache(unittest.TestCase):
+    """
+    Test the persistent cache of S3 object content CIDs.
+    """
+
+    def setUp(self):
+        # pylint: disable=consider-using-with
+        self.temp_dir = tempfile.TemporaryDirectory()
+        # The cache directory is created if necessary.
+        self.conn = open_cid_cache(
+            os.path.join(self.temp_dir.name, "cache", "cids.sqlite")
+        )
+
+    def tearDown(self):
+        self.conn.close()
+        self.temp_dir.cleanup()
+
+    def test_cid_cache(self):
+        """
+        Test that CIDs are found by bucket, key, and ETag.
+        """
+        obj_1 = {"Key": "test_1.txt", "ETag": '"etag_1"'}
+        obj_2 = {"Key": "test_2.txt", "ETag": '"etag_2"'}
+        put_cached_object_cids(
+            self.conn, _BUCKET_NAME, [(obj_1, "0x1"), (obj_2, "0x2")]
+        )
+        assert get_cached_object_cid(self.conn, _BUCKET_NAME, obj_1) == "0x1"
+        assert get_cached_object_cid(self.conn, "other-bucket", obj_1) is None
+        # Changed objects get new ETags and are not matched.
+        changed_obj_2 = dict(obj_2, ETag='"etag_3"')
+        assert get_cached_object_cids(
+            self.conn, _BUCKET_NAME, [obj_1, changed_obj_2]
+        ) == {"test_1.txt": "0x1"}
+
+    def test_cid_cache_replace(self):
+        """
+        Test that storing a CID for a cached object replaces the cached CID.
+        """
+        obj = {"Key": "test_1.txt", "ETag": '"etag_1"'}
+        put_cached_object_cids(self.conn, _BUCKET_NAME, [(obj, "0x1")])
+        put_cached_object_cids(self.conn, _BUCKET_NAME, [(obj, "0x2")])
+        assert get_cached_object_cid(self.conn, _BUCKET_NAME, obj) == "0x2"
+
+
+class TestGetCidForStream(unittest.TestCase):
+    """
+    Test object CIDs for streamed contents.
+    """
+
+    def test_get_cid_for_stream(self):
+        """
+        Test that streamed object hashes match the vBase string object CIDs
+        for the same contents, including multi-chunk and non-ASCII contents.
+        """
+        data = "vBase test vector: \u00fcn\u00efc\u00f6d\u00e9\n" * 100000
+        data_bytes = data.encode("utf-8")
+        stream = StreamingBody(io.BytesIO(data_bytes), len(data_bytes))
+        assert get_cid_for_stream(stream) == VBaseStringObject.get_cid_for_data(data)
+        stream = StreamingBody(io.BytesIO(b""), 0)
+        assert get_cid_for_stream(stream) == VBaseStringObject.get_cid_for_data("")
+
+
+class TestReadS3ObjectCid(unittest.TestCase):
+    """
+    Test S3 object content CIDs.
+    """
+
+    def setUp(self):
+        self.mock_aws = mock_aws()
+        self.mock_aws.start()
+        self.s3 = boto3.client("s3", region_name="us-east-1")
+        self.s3.create_bucket(Bucket=_BUCKET_NAME)
+        # The object spans several ranges, with a partial last range.
+        self.data = os.urandom(20 * 1024 * 1024 + 123)
+        self.s3.put_object(Bucket=_BUCKET_NAME, Key="large.bin", Body=self.data)
+        self.cid = "0x" + hashlib.sha3_256(self.data).hexdigest()
+
+    def tearDown(self):
+        self.mock_aws.stop()
+
+    def _get_obj(self) -> dict:
+        return self.s3.list_objects_v2(Bucket=_BUCKET_NAME)["Contents"][0]
+
+    def test_read_large_object_cid(self):
+        """
+        Test that a large object read using ranged GETs hashes to its CID.
+        """
+        ranges = []
+        get_object = self.s3.get_object
+
+        def _get_object(**kwargs):
+            ranges.append(kwargs.get("Range"))
+            return get_object(**kwargs)
+
+        self.s3.get_object = _get_object
+        cid = read_s3_object_cid(
+            self.s3, _BUCKET_NAME, "large.bin", obj=self._get_obj()
+        )
+        assert cid == self.cid
+        assert ranges == [
+            "bytes=0-8388607",
+            "bytes=8388608-16777215",
+            f"bytes=16777216-{len(self.data) - 1}",
+        ]
+
+    def test_read_object_cid_without_listing(self):
+        """
+        Test that an object that was not listed is read using a single GET.
+        """
+        assert read_s3_object_cid(self.s3, _BUCKET_NAME, "large.bin") == self.cid
+
+    def test_read_changed_object_cid(self):
+        """
+        Test that an object that changed after it was listed is not hashed.
+        """
+        obj = self._get_obj()
+        self.s3.put_object(Bucket=_BUCKET_NAME, Key="large.bin", Body=b"changed")
+        for size in [len(b"changed"), obj["Size"]]:
+            with self.assertRaises(ClientError):
+                read_s3_object_cid(
+                    self.s3, _BUCKET_NAME, "large.bin", obj=dict(obj, Size=size)
+                )
+
+    def test_read_object_overwritten_during_read(self):
+        """
+        Test that an object overwritten with contents of the same size
+        between ranged GETs is not hashed.
+        """
+        obj = self._get_obj()
+        get_object = self.s3.get_object
+        lock = threading.Lock()
+
+        def _get_object(**kwargs):
+            with lock:
+                response = get_object(**kwargs)
+                if kwargs["Range"].startswith("bytes=0-"):
+                    self.s3.put_object(
+                        Bucket=_BUCKET_NAME,
+                        Key="large.bin",
+                        Body=os.urandom(len(self.data)),
+                    )
+                return response
+
+        self.s3.get_object = _get_object
+        with self.assertRaises(ClientError):
+            read_s3_object_cid(self.s3, _BUCKET_NAME, "large.bin", obj=obj)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,23 +5,25 @@ If you wish to run these tests, you will have to modify AWS parameters.
 These test rely on the vBase connection and AWS settings stored in the .env file.
 """
 
+from datetime import datetime, timedelta, timezone
 import logging
 import pprint
+from typing import List
 import unittest
+from unittest.mock import patch
 import secrets
-from dotenv import dotenv_values
 import pandas as pd
+import pytest
 
 from vbase import (
     get_default_logger,
-    VBaseClientTest,
     VBaseDataset,
     VBaseStringObject,
 )
 
 from tools.utils import (
-    get_s3_handle,
     get_all_matching_objects,
+    get_object_metadata_cid,
     read_s3_object,
 )
 from tools.verify_s3_objects import (
@@ -42,14 +44,16 @@ class TestVerifyS3Objects(unittest.TestCase):
     Test S3 object commitment verification.
     """
 
-    def setUp(self):
+    @pytest.fixture(autouse=True)
+    def _set_up(self, vbc_test, env_vars, s3):
         """
-        Set up the tests.
+        Set up the tests using the shared session fixtures.
         """
+        # pylint: disable=attribute-defined-outside-init
         # The verification tests require a test C2C contract to create test commitments.
-        self.vbc = VBaseClientTest.create_instance_from_env(".env")
-        self.env_vars = dotenv_values(".env")
-        self.s3 = get_s3_handle(True, self.env_vars)
+        self.vbc = vbc_test
+        self.env_vars = env_vars
+        self.s3 = s3
 
     def test_verify_key_prefix(self):
         """
@@ -81,7 +85,7 @@ class TestVerifyS3Objects(unittest.TestCase):
                 "--use_aws_access_key",
             ]
         )
-        _LOG.info(f"Testing args:\n{pprint.pformat(vars(args))}")
+        _LOG.info("Testing args:\n%s", pprint.pformat(vars(args)))
         status, validation_log = verify_s3_objects(args, self.env_vars)
         assert status
 
@@ -92,8 +96,10 @@ class TestVerifyS3Objects(unittest.TestCase):
         """
         dataset_name = "test_" + secrets.token_hex(32)
         ds = VBaseDataset(self.vbc, dataset_name, VBaseStringObject)
-        objs = get_all_matching_objects(
-            s3=self.s3, bucket=_BUCKET_NAME, key_prefix=_KEY_PREFIX
+        objs = list(
+            get_all_matching_objects(
+                s3=self.s3, bucket=_BUCKET_NAME, key_prefix=_KEY_PREFIX
+            )
         )
         for obj in objs[:-1]:
             data = read_s3_object(self.s3, _BUCKET_NAME, obj["Key"])
@@ -108,7 +114,7 @@ class TestVerifyS3Objects(unittest.TestCase):
                 "--use_aws_access_key",
             ]
         )
-        _LOG.info(f"Testing args:\n{pprint.pformat(vars(args))}")
+        _LOG.info("Testing args:\n%s", pprint.pformat(vars(args)))
         status, validation_log = verify_s3_objects(args, self.env_vars)
         assert not status
         assert validation_log == [
@@ -116,5 +122,143 @@ class TestVerifyS3Objects(unittest.TestCase):
         ]
 
 
+class _StubUserVBaseClient:
+    """
+    vBase client stub for a user with an existing dataset.
+    """
+
+    def get_default_user(self) -> str:
+        return "0xuser"
+
+    def user_set_exists(self, user: str, set_cid: str) -> bool:
+        # pylint: disable=unused-argument
+        return True
+
+
+class _StubIndexingService:
+    """
+    Indexing service stub returning the given commitment receipts.
+    """
+
+    def __init__(self, commitment_receipts: List[dict]):
+        self.commitment_receipts = commitment_receipts
+
+    def find_user_set_objects(self, user: str, set_cid: str) -> List[dict]:
+        # pylint: disable=unused-argument
+        return self.commitment_receipts
+
+
+class TestVerifyS3ObjectsOffline(unittest.TestCase):
+    """
+    Test S3 object commitment verification options.
+    These tests use a mock S3 bucket and stub vBase services
+    and do not require vBase or AWS settings.
+    """
+
+    @pytest.fixture(autouse=True)
+    def _set_up_bucket(self, mock_s3_bucket):
+        """
+        Set up the tests using the shared mock bucket.
+        """
+        # pylint: disable=attribute-defined-outside-init
+        self.s3, self.object_cids = mock_s3_bucket
+
+    def setUp(self):
+        self.commitment_receipts = []
+
+        def _get_all_matching_objects(**kwargs):
+            # Objects listed later in the key order were modified earlier,
+            # so that the key and time orders are reversed.
+            start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+            for i, obj in enumerate(get_all_matching_objects(**kwargs)):
+                yield dict(obj, LastModified=start - timedelta(minutes=i))
+
+        self.list_objects = _get_all_matching_objects
+        for name, value in [
+            ("get_s3_handle", lambda *args: self.s3),
+            ("get_vbase_client", lambda *args: _StubUserVBaseClient()),
+            ("get_all_matching_objects", _get_all_matching_objects),
+        ]:
+            patcher = patch(f"tools.verify_s3_objects.{name}", value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = patch(
+            "vbase.Web3HTTPIndexingService.create_instance_from_env_json_descriptor",
+            lambda *args: _StubIndexingService(self.commitment_receipts),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _verify(self, *options: str) -> (bool, List[str]):
+        args = build_argument_parser().parse_args(
+            ["--dataset_name=test", "--bucket=test-bucket", "--key_prefix=test/"]
+            + list(options)
+        )
+        return verify_s3_objects(args, None)
+
+    def _commit(self, object_cids: List[str]):
+        self.commitment_receipts[:] = [
+            {"objectCid": object_cid, "timestamp": "2024-01-02 00:00:00+00:00"}
+            for object_cid in object_cids
+        ]
+
+    def test_verify_time_order(self):
+        """
+        Test that objects are verified in the order of their modification times.
+        """
+        self._commit(self.object_cids[::-1])
+        assert self._verify() == (True, [])
+        assert not self._verify("--sort_by_key")[0]
+
+    def test_verify_sort_by_key(self):
+        """
+        Test that objects are verified in the key order using --sort_by_key.
+        """
+        self._commit(self.object_cids)
+        assert self._verify("--sort_by_key") == (True, [])
+        assert not self._verify()[0]
+
+    def test_verify_fail_fast(self):
+        """
+        Test that --fail_fast only reports the first mismatched entry.
+        """
+        self._commit(self.object_cids)
+        self.commitment_receipts[1]["objectCid"] = "0x1"
+        self.commitment_receipts[3]["objectCid"] = "0x3"
+        status, validation_log = self._verify("--sort_by_key")
+        assert not status
+        assert len(validation_log) == 2
+        status, validation_log = self._verify("--sort_by_key", "--fail_fast")
+        assert not status
+        assert validation_log == [
+            f"Mismatched entry: index = 1, S3 object hash = {self.object_cids[1]}, "
+            "commitment object hash = 0x1"
+        ]
+
+    def test_verify_fail_fast_count(self):
+        """
+        Test that --fail_fast reports mismatched numbers of objects and commitments.
+        """
+        self._commit(self.object_cids[:-1])
+        assert self._verify("--sort_by_key", "--fail_fast") == (
+            False,
+            [
+                "Mismatched numbers of objects and commitments: "
+                "objects = 5, commitments = 4"
+            ],
+        )
+
+    def test_verify_use_etag(self):
+        """
+        Test verification of object metadata commitments without reading the objects.
+        """
+        objs = self.list_objects(s3=self.s3, bucket="test-bucket", key_prefix="test/")
+        self._commit([get_object_metadata_cid(obj) for obj in objs])
+        with patch("tools.verify_s3_objects.read_s3_object_cid") as read_s3_object_cid:
+            assert self._verify("--sort_by_key", "--use_etag") == (True, [])
+            assert not self._verify("--sort_by_key")[0]
+        assert read_s3_object_cid.call_count == 5
+
+
 if __name__ == "__main__":
-    unittest.main()
+    pytest.main([__file__])
@@ -3,32 +3,69 @@ Saves validityBase (vBase) commitments for one or more S3 objects.
 """
 
 import argparse
-import fnmatch
+import itertools
+from concurrent.futures import Future, ThreadPoolExecutor
 import json
 import logging
-import pprint
-from typing import Any, Dict, Optional, List
-from dotenv import dotenv_values
-
-from vbase import (
-    get_default_logger,
-    VBaseClient,
-    VBaseDataset,
-    VBaseStringObject,
+import sqlite3
+import sys
+import time
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Iterable,
+    Iterator,
+    Mapping,
+    Optional,
+    List,
+    Set,
+    Tuple,
 )
 
 from tools.utils import (
+    S3_READ_CONCURRENCY,
+    configure_logging,
+    get_cached_object_cids,
+    get_env_int,
     get_s3_handle,
     get_all_matching_objects,
-    read_s3_object,
+    get_object_metadata_cid,
+    get_set_cid_for_dataset,
+    get_vbase_client,
+    load_env,
+    open_cid_cache,
+    prefetch,
+    put_cached_object_cids,
+    read_s3_object_cid,
+    read_s3_object_metadata,
 )
 
+if TYPE_CHECKING:
+    from vbase import VBaseClient
 
-_LOG = get_default_logger(__name__)
+
+_LOG = logging.getLogger(__name__)
 _LOG.setLevel(logging.INFO)
 
-# Batch size when committing batches of objects.
-_COMMIT_OBJECT_BATCH_SIZE = 20
+# Default batch size when committing batches of objects.
+# May be overridden using the VBASE_COMMIT_BATCH environment variable
+# or the --commit_batch_size argument.
+# The largest workable batch depends on the chain gas limit;
+# batches that fail gas estimation are retried in smaller sub-batches.
+_COMMIT_OBJECT_BATCH_SIZE = get_env_int("VBASE_COMMIT_BATCH", 100)
+
+# Number of attempts to post a commitment for a single object before skipping it.
+_COMMIT_MAX_ATTEMPTS = 3
+
+# Maximum delay in seconds between commitment attempts after failures.
+_COMMIT_MAX_BACKOFF = 8
+
+# Number of consecutive successful commitments at a reduced batch size
+# before the batch size is doubled back towards the target.
+_COMMIT_GROW_AFTER_SUCCESSES = 3
+
+# (user address, set CID) pairs for the sets known to exist.
+_KNOWN_SETS: Set[Tuple[str, str]] = set()
 
 
 def build_argument_parser() -> argparse.ArgumentParser:
@@ -54,7 +91,9 @@ Such commitments establish provenance and PIT accuracy of datasets and its recor
         help="vBase dataset to receive commitments",
     )
     parser.add_argument("--bucket", type=str, required=True, help="S3 bucket name")
-    parser.add_argument(
+    # Exactly one of the object selection arguments must be provided.
+    key_group = parser.add_mutually_exclusive_group(required=True)
+    key_group.add_argument(
         "--key",
         type=str,
         required=False,
@@ -64,7 +103,7 @@ If supplied, a single object will be committed.
 --key, --key_prefix, or --key_pattern argument must be provided.
 """,
     )
-    parser.add_argument(
+    key_group.add_argument(
         "--key_prefix",
         type=str,
         required=False,
@@ -74,7 +113,7 @@ If supplied, objects matching the prefix will be committed.
 --key, --key_prefix, or --key_pattern argument must be provided.
     """,
     )
-    parser.add_argument(
+    key_group.add_argument(
         "--key_pattern",
         type=str,
         required=False,
@@ -108,6 +147,39 @@ The version_id option is only compatible with single object (--key argument) com
         help="""
 use AWS authentication: If specified, AWS Access Key defined in .env will be used. 
 In this case, .env must define AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY variables.
+""",
+    )
+    parser.add_argument(
+        "--commit_batch_size",
+        type=int,
+        required=False,
+        default=_COMMIT_OBJECT_BATCH_SIZE,
+        help="""
+number of objects committed in a single batch commitment: 
+Larger batches require fewer commitment transactions. 
+The largest workable batch size depends on the chain gas limit.
+""",
+    )
+    parser.add_argument(
+        "--use_etag",
+        required=False,
+        action="store_true",
+        help="""
+commit object metadata: If specified, the object key, ETag, size, and last modified time
+will be committed instead of the object contents. 
+Objects are not downloaded, but the commitment relies on the S3 ETag
+to identify the object contents.
+Such datasets are verified using verify_s3_objects --use_etag.
+""",
+    )
+    parser.add_argument(
+        "--use_cid_cache",
+        required=False,
+        action="store_true",
+        help="""
+cache object hashes: If specified, object content hashes are cached locally
+by object key and ETag, and unchanged objects are not downloaded again.
+The cache file may be set using the VBASE_CID_CACHE environment variable.
 """,
     )
     parser.add_argument(
@@ -131,51 +203,419 @@ examples:
     return parser
 
 
+class CommitmentError(Exception):
+    """
+    Raised when some of the selected objects could not be committed.
+    The error keeps the receipts for the objects that were committed.
+    """
+
+    def __init__(self, message: str, commitment_receipts: List[dict]):
+        """
+        :param message: The error message.
+        :param commitment_receipts: The list of commitment receipt dictionaries
+            for the objects that were committed.
+        """
+        super().__init__(message)
+        self.commitment_receipts = commitment_receipts
+
+
+# Error messages of transactions that exceed the gas available to a block
+# or to the sender's gas allowance.
+# Such transactions fail gas estimation, before they are sent.
+_BATCH_SIZE_ERROR_MESSAGES = (
+    "exceeds block gas limit",
+    "gas required exceeds allowance",
+)
+
+# Error messages of account errors that fail every subsequent commitment.
+_FATAL_ERROR_MESSAGES = (
+    "insufficient funds",
+    "nonce",
+)
+
+
+def _is_batch_size_error(e: Exception) -> bool:
+    """
+    Checks whether a commitment error is caused by the transaction size.
+    Reverts and gas limit errors are raised when the transaction is estimated,
+    before it is sent, so the objects may be safely retried in smaller batches.
+
+    :param e: The commitment error.
+    :returns: True if the commitment may be retried in smaller batches.
+    """
+    # pylint: disable=import-outside-toplevel
+    from web3.exceptions import ContractLogicError
+
+    if isinstance(e, ContractLogicError):
+        return True
+    message = str(e).lower()
+    return any(m in message for m in _BATCH_SIZE_ERROR_MESSAGES)
+
+
+def _is_fatal_commitment_error(e: Exception) -> bool:
+    """
+    Checks whether a commitment error will fail the remaining commitments.
+    Insufficient funds and nonce errors are not fixed by retries
+    or smaller batches.
+
+    :param e: The commitment error.
+    :returns: True if the commitments should be aborted.
+    """
+    message = str(e).lower()
+    return any(m in message for m in _FATAL_ERROR_MESSAGES)
+
+
+class _AdaptiveBatchCommitter:  # pylint: disable=too-few-public-methods
+    """
+    Commits object CIDs in sub-batches sized from commitment feedback.
+    A commitment that fails due to its size halves the sub-batch size
+    and retries the same CIDs.
+    Consecutive successes at a reduced size double it back to the target size.
+    Every failure backs off exponentially before the next commitment.
+    The committer is stateful and must be used from a single thread.
+    """
+
+    def __init__(self, vbc: "VBaseClient", set_cid: str, target_batch: int):
+        """
+        :param vbc: The vBaseClient object.
+        :param set_cid: The CID of the set to receive the objects.
+        :param target_batch: The target number of objects per commitment.
+        """
+        self.vbc = vbc
+        self.set_cid = set_cid
+        self.target_batch = target_batch
+        self.current_batch = target_batch
+        self.n_successes = 0
+        self.n_failures = 0
+
+    def _on_success(self):
+        self.n_failures = 0
+        self.n_successes += 1
+        if (
+            self.current_batch < self.target_batch
+            and self.n_successes >= _COMMIT_GROW_AFTER_SUCCESSES
+        ):
+            self.current_batch = min(self.target_batch, self.current_batch * 2)
+            self.n_successes = 0
+            _LOG.info("Increased commit batch size to %d", self.current_batch)
+
+    def _on_failure(self):
+        self.n_successes = 0
+        self.n_failures += 1
+        # Back off exponentially on consecutive failures.
+        time.sleep(min(2 ** (self.n_failures - 1), _COMMIT_MAX_BACKOFF))
+
+    def commit(self, object_cids: List[str]) -> List[dict]:
+        """
+        Commits object CIDs in sub-batches of the current size.
+        Objects that cannot be committed are logged and skipped,
+        so that they do not prevent commitments for the rest of the objects:
+        an object that fails due to size errors on its own after retries,
+        and objects in a sub-batch that fails for other reasons.
+        The latter are not retried, since the transaction may have been sent,
+        and a retry could commit the objects twice.
+        Account errors such as insufficient funds abort the commitments.
+
+        :param object_cids: The object CIDs to commit.
+        :returns: The list of commitment receipt dictionaries
+            for the successfully committed objects.
+        :raises CommitmentError: If the commitments fail with an account error.
+        """
+        receipts = []
+        i = 0
+        n_attempts = 0
+        while i < len(object_cids):
+            sub_batch = object_cids[i : i + self.current_batch]
+            n_attempts += 1
+            try:
+                receipts += self.vbc.add_set_objects_batch(
+                    set_cid=self.set_cid, object_cids=sub_batch
+                )
+            # pylint: disable=broad-except
+            except Exception as e:
+                _LOG.error(
+                    "Error posting commitment: attempt = %d, batch size = %d: %s",
+                    n_attempts,
+                    len(sub_batch),
+                    str(e),
+                )
+                if _is_fatal_commitment_error(e):
+                    raise CommitmentError(
+                        f"Aborted commitments: {str(e)}", receipts
+                    ) from e
+                self._on_failure()
+                if _is_batch_size_error(e):
+                    if len(sub_batch) > 1:
+                        # Retry the same CIDs in smaller sub-batches.
+                        self.current_batch = len(sub_batch) // 2
+                        _LOG.info("Reduced commit batch size to %d", self.current_batch)
+                        n_attempts = 0
+                        continue
+                    if n_attempts < _COMMIT_MAX_ATTEMPTS:
+                        continue
+                _LOG.error("Skipping objects: object CIDs = %s", sub_batch)
+            else:
+                self._on_success()
+            i += len(sub_batch)
+            n_attempts = 0
+        return receipts
+
+
+def _iter_object_batches(objs: Iterable[dict], batch_size: int) -> Iterator[List[dict]]:
+    """
+    Produces batches of objects.
+    The objects are consumed in batches as they become available,
+    so that commitments may start before the listing completes.
+
+    :param objs: The S3 objects to commit.
+    :param batch_size: The number of objects in a batch.
+    :returns: The iterator producing the lists of objects in each batch.
+    """
+    objs = iter(objs)
+    for batch_number in itertools.count(1):
+        batch = list(itertools.islice(objs, batch_size))
+        if not batch:
+            return
+        # Object keys are only formatted if debug logging is enabled.
+        _LOG.info("Committing batch %d: %d objects", batch_number, len(batch))
+        for obj in batch:
+            _LOG.debug("Committing %s", obj["Key"])
+        yield batch
+
+
+def _wait_for_commit(future: Future, commitment_receipts: List[dict]) -> List[dict]:
+    """
+    Waits for a batch commitment.
+
+    :param future: The future of the batch commitment.
+    :param commitment_receipts: The commitment receipts for the previous batches.
+    :returns: The commitment receipts for the batch.
+    :raises CommitmentError: If the commitments were aborted.
+        The error keeps the receipts for the previous batches
+        and the objects committed from the batch.
+    """
+    try:
+        return future.result()
+    except CommitmentError as e:
+        raise CommitmentError(
+            str(e), commitment_receipts + e.commitment_receipts
+        ) from e
+
+
+def _get_object_cid(s3: Any, bucket: str, obj: dict, use_etag: bool) -> str:
+    """
+    Worker function returning the object CID for a listed S3 object.
+
+    :param s3: The AWS S3 boto client object.
+    :param bucket: The S3 bucket containing the object.
+    :param obj: The listed object dictionary.
+    :param use_etag: If True, return the CID for the object metadata
+        instead of the contents.
+    :returns: The object CID.
+    """
+    if use_etag:
+        # Get object hash for the listed object metadata.
+        return get_object_metadata_cid(obj)
+    # Get object hash for the object contents.
+    return read_s3_object_cid(s3, bucket, obj["Key"], obj=obj)
+
+
+def _hash_object_batch(
+    executor: ThreadPoolExecutor,
+    s3: Any,
+    args: argparse.Namespace,
+    batch: List[dict],
+    cid_cache: Optional[sqlite3.Connection],
+) -> List[str]:
+    """
+    Builds the object hashes for a batch of objects.
+    The objects in the batch are fetched concurrently.
+    Objects that cannot be read are logged and skipped,
+    so that a failed read does not fail the rest of the batch.
+    Objects with cached CIDs for the listed ETags are not read,
+    and the CIDs of the objects read are cached.
+
+    :param executor: The executor reading the objects.
+    :param s3: The AWS S3 boto client object.
+    :param args: The command arguments.
+    :param batch: The listed objects.
+    :param cid_cache: The optional cache of object content CIDs.
+    :returns: The object CIDs in the order of the batch objects.
+    """
+    cached_cids = (
+        get_cached_object_cids(cid_cache, args.bucket, batch)
+        if cid_cache is not None
+        else {}
+    )
+    futures = [
+        (
+            None
+            if obj["Key"] in cached_cids
+            else executor.submit(_get_object_cid, s3, args.bucket, obj, args.use_etag)
+        )
+        for obj in batch
+    ]
+    object_cids = []
+    read_cids = []
+    for obj, future in zip(batch, futures):
+        if future is None:
+            object_cids.append(cached_cids[obj["Key"]])
+            continue
+        try:
+            object_cid = future.result()
+        # pylint: disable=broad-except
+        except Exception as e:
+            _LOG.error("Error reading object: key = %s: %s", obj["Key"], str(e))
+            continue
+        object_cids.append(object_cid)
+        read_cids.append((obj, object_cid))
+    if cid_cache is not None and read_cids:
+        put_cached_object_cids(cid_cache, args.bucket, read_cids)
+    return object_cids
+
+
 def commit_s3_object_list(
-    vbc: VBaseClient, dataset_name: str, s3: Any, bucket: str, objs: List[dict]
+    vbc: "VBaseClient",
+    s3: Any,
+    args: argparse.Namespace,
+    objs: Iterable[dict],
+    cid_cache: Optional[sqlite3.Connection] = None,
 ) -> List[dict]:
     """
-    Worker function processing the args to execute the task.
-    Factoring out the worker allows easier unit tests with test args.
+    Worker function committing listed S3 objects to the dataset.
 
     :param vbc: The vBaseClient object.
-    :param dataset_name: Name of the vBase set to receive the object hashes.
     :param s3: The AWS S3 boto client object.
-    :param bucket: The S3 bucket containing the object.
-    :param objs: The S3 objects to commit.
+    :param args: The command arguments.
+        The objects are committed to args.dataset_name
+        in batches of args.commit_batch_size objects.
+        If args.use_etag is set, the object metadata is committed
+        instead of the contents.
+    :param objs: The S3 objects in args.bucket to commit.
+        May be an iterator producing the objects while they are committed.
+    :param cid_cache: The optional cache of object content CIDs
+        opened using open_cid_cache().
+        Objects with cached CIDs are not read.
+        The cache is not used when committing the object metadata.
     :returns: The list of commitment receipt dictionaries.
+    :raises CommitmentError: If some of the objects could not be read or committed.
+        Objects that fail are skipped, so that the rest of the objects are committed.
+        Account errors such as insufficient funds abort the commitments.
     """
+    if args.use_etag:
+        cid_cache = None
+
+    # Commitment batch sizes adapt to failures across the object batches.
+    committer = _AdaptiveBatchCommitter(
+        vbc, get_set_cid_for_dataset(args.dataset_name), args.commit_batch_size
+    )
+
     # Commit objects batches.
+    # The objects in a batch are fetched concurrently.
+    # Batch commitments are posted on a separate single thread,
+    # so that we fetch and hash the next batch while the previous one is committed.
+    # Using a single commit thread keeps at most one commitment in flight
+    # and preserves the commitment order.
     commitment_receipts = []
-    for i in range(0, len(objs), _COMMIT_OBJECT_BATCH_SIZE):
-        batch = objs[i : i + _COMMIT_OBJECT_BATCH_SIZE]
-        # Build object hashes.
-        object_cids = []
-        for obj in batch:
-            # Get object hash for the object contents.
-            key = obj["Key"]
-            print(f"Committing object: {key}")
-            file_content = read_s3_object(s3, bucket, key)
-            object_cid = VBaseStringObject.get_cid_for_data(file_content)
-            object_cids.append(object_cid)
-
-        # Commit all hashes for the batch.
-        commitment_receipt = {}
-        try:
-            commitment_receipt = vbc.add_set_objects_batch(
-                set_cid=VBaseDataset.get_set_cid_for_dataset(dataset_name),
-                object_cids=object_cids,
-            )
-        # pylint: disable=broad-except
-        except Exception as e:
-            _LOG.error("Error posting commitment: %s", str(e))
-        commitment_receipts += commitment_receipt
+    n_objects = 0
+    n_read_errors = 0
+    pending_commit: Optional[Future] = None
+    with ThreadPoolExecutor(
+        max_workers=S3_READ_CONCURRENCY
+    ) as fetch_executor, ThreadPoolExecutor(max_workers=1) as commit_executor:
+        for batch in _iter_object_batches(objs, args.commit_batch_size):
+            n_objects += len(batch)
+            object_cids = _hash_object_batch(fetch_executor, s3, args, batch, cid_cache)
+            n_read_errors += len(batch) - len(object_cids)
+            if not object_cids:
+                continue
+
+            # Wait for the previous batch before submitting the next one.
+            if pending_commit is not None:
+                commitment_receipts += _wait_for_commit(
+                    pending_commit, commitment_receipts
+                )
+            pending_commit = commit_executor.submit(committer.commit, object_cids)
+
+        # Wait for the last batch.
+        if pending_commit is not None:
+            commitment_receipts += _wait_for_commit(pending_commit, commitment_receipts)
+
+    # Skipped objects would fail later verification of the dataset,
+    # so report them as an error.
+    n_uncommitted = n_objects - len(commitment_receipts)
+    if n_uncommitted > 0:
+        raise CommitmentError(
+            f"Failed to commit {n_uncommitted} of {n_objects} objects: "
+            f"read errors = {n_read_errors}, "
+            f"commitment errors = {n_uncommitted - n_read_errors}",
+            commitment_receipts,
+        )
     return commitment_receipts
 
 
+def _print_commitment_receipts(commitment_receipts: List[dict], verbose: bool):
+    """
+    Prints the commitment receipts.
+    Serializing the receipts for large commitments is expensive,
+    so the receipts are only printed in verbose mode.
+
+    :param commitment_receipts: The list of commitment receipt dictionaries.
+    :param verbose: If True, print the receipts rather than their number.
+    """
+    if verbose:
+        print(f"Commitment receipts: {json.dumps(commitment_receipts)}")
+    else:
+        print(f"Commitment receipts: {len(commitment_receipts)}")
+
+
+def _commit_s3_object(
+    vbc: "VBaseClient", set_cid: str, s3: Any, args: argparse.Namespace
+) -> dict:
+    """
+    Worker function committing the single S3 object selected by args.key.
+
+    :param vbc: The vBaseClient object.
+    :param set_cid: The CID of the vBase set to receive the object hash.
+    :param s3: The AWS S3 boto client object.
+    :param args: The command arguments.
+    :returns: The commitment receipt dictionary.
+    :raises CommitmentError: If the object could not be read or committed.
+    """
+    _LOG.info("Committing object: %s", args.key)
+
+    try:
+        if args.use_etag:
+            # Get object hash for the object metadata.
+            object_cid = get_object_metadata_cid(
+                read_s3_object_metadata(s3, args.bucket, args.key, args.version_id)
+            )
+        else:
+            # Get object hash for the contents.
+            object_cid = read_s3_object_cid(s3, args.bucket, args.key, args.version_id)
+    # pylint: disable=broad-except
+    except Exception as e:
+        raise CommitmentError(
+            f"Error reading object: key = {args.key}: {str(e)}", []
+        ) from e
+
+    # Post the object commitment.
+    # Since we are merely adding a record to a dataset,
+    # we just need to create a writable dataset
+    # that receives the new record commitment.
+    try:
+        return vbc.add_set_object(
+            set_cid=set_cid,
+            object_cid=object_cid,
+        )
+    # pylint: disable=broad-except
+    except Exception as e:
+        raise CommitmentError(f"Error posting commitment: {str(e)}", []) from e
+
+
 def commit_s3_objects(
     args: argparse.Namespace,
-    env_vars: Dict[str, Optional[str]],
+    env_vars: Mapping[str, Optional[str]],
 ) -> List[dict]:
     """
     Worker function processing the args to execute the task.
@@ -184,124 +624,83 @@ def commit_s3_objects(
     :param args: The command arguments.
     :param env_vars: The environment variables containing static configuration.
     :returns: The list of commitment receipt dictionaries.
+    :raises CommitmentError: If some of the selected objects could not be committed.
     """
     print(f"Committing S3 objects: {json.dumps(vars(args))}")
 
     if args.verbose:
         _LOG.setLevel(logging.DEBUG)
 
-    # Verify the version id settings.
-    # If committing a specific version, the version_id argument should be present.
-    if args.version == "version_id" and args.version_id is None:
-        _LOG.error(
-            'The --version_id argument is required when --version is set to "version_id".'
-        )
-
-    # Verify the key settings.
-    provided_count = sum(
-        [
-            args.key is not None,
-            args.key_prefix is not None,
-            args.key_pattern is not None,
-        ]
-    )
-    if provided_count != 1:
-        _LOG.error(
-            "Exactly one of the arguments --key, --key_prefix, or --key_pattern must be provided."
-        )
-    if (args.key_prefix or args.key_pattern) and args.version == "version_id":
-        _LOG.error(
-            "--key_prefix and --key_pattern arguments are not compatible with "
-            '--version="version_id".'
-        )
-
     # Static configuration such as S3 credentials and vBase access parameters
     # are stored in the .env file.
     s3 = get_s3_handle(args.use_aws_access_key, env_vars)
-    vbc = VBaseClient.create_instance_from_env(".env")
+    vbc = get_vbase_client(".env")
 
-    set_cid = VBaseDataset.get_set_cid_for_dataset(args.dataset_name)
+    set_cid = get_set_cid_for_dataset(args.dataset_name)
 
     # Commit the dataset (set), if necessary.
+    # Sets known to exist are cached to skip the existence check RPC.
+    # Set commitments cannot be removed, so only positive results are cached.
     user_address = vbc.get_default_user()
     assert user_address is not None
-    if not vbc.user_set_exists(user_address, set_cid):
-        print(
-            f"Dataset commitment does not exist: user = {user_address}, "
-            f"dataset_name = {args.dataset_name}, set_cid = {set_cid}"
-        )
-        cl = vbc.add_set(set_cid)
-        assert cl == {
-            "user": user_address,
-            "setCid": set_cid,
-        }
+    if (user_address, set_cid) not in _KNOWN_SETS:
+        if not vbc.user_set_exists(user_address, set_cid):
+            print(
+                f"Dataset commitment does not exist: user = {user_address}, "
+                f"dataset_name = {args.dataset_name}, set_cid = {set_cid}"
+            )
+            cl = vbc.add_set(set_cid)
+            assert cl == {
+                "user": user_address,
+                "setCid": set_cid,
+            }
+        _KNOWN_SETS.add((user_address, set_cid))
 
-    commitment_receipts = []
     if args.key:
         # Commit a single object.
         assert not args.key_prefix
-        print(f"Committing object: {args.key}")
-
-        # Get object hash for the contents.
-        file_content = read_s3_object(s3, args.bucket, args.key, args.version_id)
-        object_cid = VBaseStringObject.get_cid_for_data(file_content)
-
-        # Post the object commitment.
-        # Since we are merely adding a record to a dataset,
-        # we just need to create a writable dataset
-        # that receives the new record commitment.
-        commitment_receipt = {}
-        try:
-            commitment_receipt = vbc.add_set_object(
-                set_cid=set_cid,
-                object_cid=object_cid,
-            )
-        # pylint: disable=broad-except
-        except Exception as e:
-            _LOG.error("Error posting commitment: %s", str(e))
-        commitment_receipts.append(commitment_receipt)
+        commitment_receipts = [_commit_s3_object(vbc, set_cid, s3, args)]
 
     elif args.key_prefix or args.key_pattern:
         # Commit all matching objects.
         assert args.version == "latest"
 
-        if args.key_prefix:
-            # List the S3 objects with the given prefix.
-            objs = get_all_matching_objects(
-                s3=s3, bucket=args.bucket, key_prefix=args.key_prefix
-            )
-        else:
-            assert args.key_pattern
-            # List all S3 objets in the bucket.
-            objs = get_all_matching_objects(s3=s3, bucket=args.bucket)
-            # Match the pattern.
-            objs = [
-                obj for obj in objs if fnmatch.fnmatch(obj["Key"], args.key_pattern)
-            ]
-
-        # Sort the results alphabetically.
-        objs.sort(key=lambda x: x["Key"])
-        _LOG.debug("s3.list_objects_v2(): objects = %s", pprint.pformat(objs))
-
-        commitment_receipts = commit_s3_object_list(
-            vbc=vbc,
-            dataset_name=args.dataset_name,
-            s3=s3,
-            bucket=args.bucket,
-            objs=objs,
+        # List the S3 objects matching the given prefix or pattern.
+        # S3 lists objects in UTF-8 binary key order, which matches Python's
+        # string ordering, so the objects are committed alphabetically.
+        objs = prefetch(
+            get_all_matching_objects(
+                s3=s3,
+                bucket=args.bucket,
+                key_prefix=args.key_prefix,
+                key_pattern=args.key_pattern,
+            ),
+            maxsize=args.commit_batch_size * 4,
         )
+
+        cid_cache = open_cid_cache() if args.use_cid_cache else None
+        try:
+            commitment_receipts = commit_s3_object_list(
+                vbc=vbc, s3=s3, args=args, objs=objs, cid_cache=cid_cache
+            )
+        finally:
+            if cid_cache is not None:
+                cid_cache.close()
     else:
         # Invalid object batch settings.
         assert args.key or args.key_prefix or args.key_pattern
 
     dataset_info = {
-        "owner": commitment_receipts[0]["user"],
+        "owner": user_address,
         "name": args.dataset_name,
         "hash": set_cid,
     }
-    print("Successfully posted commitment.")
+    if commitment_receipts:
+        print("Successfully posted commitment.")
+    else:
+        print("No matching objects to commit.")
     print(f"Dataset: {json.dumps(dataset_info)}")
-    print(f"Commitment receipts: {json.dumps(commitment_receipts)}")
+    _print_commitment_receipts(commitment_receipts, args.verbose)
 
     return commitment_receipts
 
@@ -312,7 +711,30 @@ def main():
     """
     parser = build_argument_parser()
     args = parser.parse_args()
-    commit_s3_objects(args, dotenv_values(".env"))
+
+    if args.commit_batch_size < 1:
+        parser.error("The --commit_batch_size argument must be positive.")
+
+    # Verify the version id settings.
+    # Fail before any S3 or vBase connections are made.
+    # If committing a specific version, the version_id argument should be present.
+    if args.version == "version_id" and args.version_id is None:
+        parser.error(
+            'The --version_id argument is required when --version is set to "version_id".'
+        )
+    if (args.key_prefix or args.key_pattern) and args.version == "version_id":
+        parser.error(
+            "--key_prefix and --key_pattern arguments are not compatible with "
+            '--version="version_id".'
+        )
+
+    configure_logging(__name__)
+    try:
+        commit_s3_objects(args, load_env())
+    except CommitmentError as e:
+        print(f"Failed to post commitment: {str(e)}")
+        _print_commitment_receipts(e.commitment_receipts, args.verbose)
+        sys.exit(1)
 
 
 if __name__ == "__main__":
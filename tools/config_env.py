@@ -5,8 +5,11 @@ Asks user a series of questions to prepare the .env configuration file.
 
 import getpass
 import os
+import re
 import secrets
-from eth_account import Account
+import stat
+import tempfile
+from typing import Dict, List
 
 
 DEFAULT_ENV_CONTENTS = """
@@ -25,6 +28,9 @@ VBASE_API_KEY="USER_VBASE_API_KEY"
 VBASE_COMMITMENT_SERVICE_PRIVATE_KEY="USER_VBASE_COMMITMENT_SERVICE_PRIVATE_KEY"
 """
 
+# Matches a variable assignment line in the .env file.
+_ENV_VAR_RE = re.compile(r"\s*([A-Za-z_][A-Za-z0-9_]*)\s*=")
+
 
 def ask_yes_no_question(question: str, default: str) -> bool:
     """
@@ -68,6 +74,69 @@ def ask_string_question(question: str, default=None, secret=False):
             return answer
 
 
+def index_env_lines(lines: List[str]) -> Dict[str, int]:
+    """
+    Indexes the variables defined in the .env file lines.
+
+    :param lines: The .env file lines.
+    :returns: The dictionary mapping variable names to line indices.
+    """
+    line_index = {}
+    for i, line in enumerate(lines):
+        match = _ENV_VAR_RE.match(line)
+        if match:
+            line_index[match.group(1)] = i
+    return line_index
+
+
+def set_env_var(lines: List[str], line_index: Dict[str, int], name: str, value: str):
+    """
+    Sets a variable in the .env file lines.
+    Replaces the line defining the variable or appends a new line.
+
+    :param lines: The .env file lines.
+    :param line_index: The dictionary mapping variable names to line indices.
+    :param name: The variable name.
+    :param value: The variable value.
+    """
+    line = f'{name} = "{value}"\n'
+    if name in line_index:
+        lines[line_index[name]] = line
+    else:
+        if lines and not lines[-1].endswith("\n"):
+            lines[-1] += "\n"
+        line_index[name] = len(lines)
+        lines.append(line)
+
+
+def write_env_file(file_path: str, lines: List[str]):
+    """
+    Writes the .env file lines atomically.
+    The lines are written to a temporary file that then replaces the .env file,
+    so that the .env file is never left partially written.
+    The temporary file is created readable only by the owner,
+    and the permissions of an existing .env file are kept,
+    so that the secrets in the file are never exposed.
+
+    :param file_path: The .env file path.
+    :param lines: The .env file lines.
+    """
+    fd, tmp_file_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(file_path)),
+        prefix=os.path.basename(file_path) + ".",
+        suffix=".tmp",
+    )
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            file.writelines(lines)
+        if os.path.exists(file_path):
+            os.chmod(tmp_file_path, stat.S_IMODE(os.stat(file_path).st_mode))
+        os.replace(tmp_file_path, file_path)
+    except BaseException:
+        os.remove(tmp_file_path)
+        raise
+
+
 def main():
     """
     Main function for the tool.
@@ -86,6 +155,9 @@ def main():
     # Read the content of the .env file.
     with open(file_path, encoding="utf-8") as file:
         lines = file.readlines()
+    # Index the variables once, so that updates do not rescan the file
+    # and only match the exact variable names.
+    line_index = index_env_lines(lines)
 
     if ask_yes_no_question(
         "\nDo you want to configure the vBase API key?\n",
@@ -94,11 +166,13 @@ def main():
         vbase_api_key = ask_string_question(
             "Please enter the vBase API key", secret=True
         )
-        for i, line in enumerate(lines):
-            if "VBASE_API_KEY" in line:
-                lines[i] = f'VBASE_API_KEY = "{vbase_api_key}"\n'
+        set_env_var(lines, line_index, "VBASE_API_KEY", vbase_api_key)
 
     if ask_yes_no_question("\nDo you want to generate a new private key?", "y"):
+        # eth_account is slow to import and is only needed to derive the address.
+        # pylint: disable=import-outside-toplevel
+        from eth_account import Account
+
         private_key = "0x" + secrets.token_hex(32)
         # The following line creates overactive warning
         # because of difficulties with a decorated declaration:
@@ -107,10 +181,9 @@ def main():
         account = Account.from_key(private_key=private_key)
         # Update .env with the new private key and account.
         print(f"\nGenerated private key for a new account: {account.address}")
-        # Find the line containing the VBASE_COMMITMENT_SERVICE_PRIVATE_KEY and update it
-        for i, line in enumerate(lines):
-            if "VBASE_COMMITMENT_SERVICE_PRIVATE_KEY" in line:
-                lines[i] = f'VBASE_COMMITMENT_SERVICE_PRIVATE_KEY = "{private_key}"\n'
+        set_env_var(
+            lines, line_index, "VBASE_COMMITMENT_SERVICE_PRIVATE_KEY", private_key
+        )
 
     if ask_yes_no_question(
         "\nDo you want to configure AWS access keys?\n"
@@ -124,15 +197,11 @@ def main():
         aws_secret_access_key = ask_string_question(
             "Please enter the AWS_SECRET_ACCESS_KEY", secret=True
         )
-        for i, line in enumerate(lines):
-            if "AWS_ACCESS_KEY_ID" in line:
-                lines[i] = f'AWS_ACCESS_KEY_ID = "{aws_access_key_id}"\n'
-            if "AWS_SECRET_ACCESS_KEY" in line:
-                lines[i] = f'AWS_SECRET_ACCESS_KEY = "{aws_secret_access_key}"\n'
+        set_env_var(lines, line_index, "AWS_ACCESS_KEY_ID", aws_access_key_id)
+        set_env_var(lines, line_index, "AWS_SECRET_ACCESS_KEY", aws_secret_access_key)
 
     # Write the updated content back to the .env file.
-    with open(file_path, "w", encoding="utf-8") as file:
-        file.writelines(lines)
+    write_env_file(file_path, lines)
 
     print("\nThe .env file has been updated.")
     print(
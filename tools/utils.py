@@ -2,19 +2,208 @@
 Common validityBase (vBase) tools code
 """
 
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import fnmatch
+from functools import lru_cache
+import hashlib
+from io import BytesIO
 import logging
+import os
+import queue
+import re
+import sqlite3
 import sys
-from typing import Any, Dict, Optional, List
-import boto3
+import threading
+from types import MappingProxyType
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+)
+from dotenv import dotenv_values
 
-from vbase import get_default_logger
+# The AWS and vBase packages are slow to import,
+# so they are imported by the functions that use them.
+# This keeps the tools package imports and the command line help fast.
+if TYPE_CHECKING:
+    from vbase import VBaseClient
 
 
-_LOG = get_default_logger(__name__)
+_LOG = logging.getLogger(__name__)
 _LOG.setLevel(logging.INFO)
 
 
-def check_env_var(env_vars_dict: Dict[str, Optional[str]], env_var_name: str):
+def get_env_int(env_var_name: str, default: int) -> int:
+    """
+    Returns a positive integer setting from an environment variable.
+    The settings are read when the tools are imported,
+    so invalid values fall back to the default with a warning
+    rather than failing the imports and the command line help.
+
+    :param env_var_name: The environment variable name.
+    :param default: The default value if the variable is not set or invalid.
+    :returns: The setting value.
+    """
+    value = os.getenv(env_var_name)
+    if value is None:
+        return default
+    try:
+        int_value = int(value)
+    except ValueError:
+        int_value = 0
+    if int_value < 1:
+        _LOG.warning(
+            "Invalid %s value: %s: must be a positive integer, using %d",
+            env_var_name,
+            value,
+            default,
+        )
+        return default
+    return int_value
+
+# Number of S3 objects read concurrently.
+# S3 reads are network-bound and independent, so the tools read objects concurrently.
+# Boto3 clients are thread-safe, so the reading threads share the S3 handle.
+# May be overridden using the VBASE_S3_CONCURRENCY environment variable.
+S3_READ_CONCURRENCY = get_env_int("VBASE_S3_CONCURRENCY", 10)
+
+# Size of the ranges read using concurrent ranged GETs for large objects.
+_S3_RANGE_SIZE = 8 * 1024 * 1024
+
+# Number of ranges read concurrently across all large objects.
+_S3_RANGE_CONCURRENCY = 8
+
+# S3 client settings.
+# The connection pool must be large enough for the concurrent object
+# and range reads, otherwise the reading threads wait for pooled connections.
+# The pool size may be overridden using the VBASE_S3_POOL environment variable.
+# Slow or failed requests are retried by botocore with adaptive backoff.
+_S3_CLIENT_CONFIG = {
+    "max_pool_connections": get_env_int(
+        "VBASE_S3_POOL", max(32, S3_READ_CONCURRENCY + _S3_RANGE_CONCURRENCY)
+    ),
+    "retries": {"mode": "adaptive", "max_attempts": 5},
+    "tcp_keepalive": True,
+    "connect_timeout": 3,
+    "read_timeout": 10,
+}
+
+# Chunk size for streaming S3 object contents into the object hash.
+# Larger chunks mean fewer Python-level hash updates per object,
+# while memory use stays bounded at one chunk per concurrent read.
+_S3_READ_CHUNK_SIZE = 1024 * 1024
+
+# Executor reading the ranges of large objects.
+# The executor is shared by all object reads,
+# so that the concurrent reads of large objects do not multiply the S3 connections.
+_S3_RANGE_EXECUTOR = ThreadPoolExecutor(
+    max_workers=_S3_RANGE_CONCURRENCY, thread_name_prefix="s3_range"
+)
+
+# Number of ranges read ahead of the object hashes across all large objects.
+# Each range is held in memory until it is hashed,
+# so the read-ahead memory is bounded at 16 x 8 MiB = 128 MiB
+# regardless of the number of objects read concurrently.
+_S3_RANGE_BUFFERS = threading.BoundedSemaphore(2 * _S3_RANGE_CONCURRENCY)
+
+# Transfer settings for reading S3 objects.
+# Objects above the threshold are downloaded using concurrent ranged GETs.
+_S3_TRANSFER_CONFIG = {
+    "multipart_threshold": 8 * 1024 * 1024,
+    "max_concurrency": 8,
+    "use_threads": True,
+}
+
+# Default path of the persistent cache of S3 object content CIDs.
+# May be overridden using the VBASE_CID_CACHE environment variable.
+CID_CACHE_PATH = os.getenv(
+    "VBASE_CID_CACHE",
+    os.path.join(os.path.expanduser("~"), ".vbase", "s3_cid_cache.sqlite"),
+)
+
+
+def configure_logging(name: str):
+    """
+    Configures the default vBase log handlers for a tool run from the command line.
+    The tool modules use plain loggers, so that importing them does not import vBase.
+
+    :param name: The tool module name.
+    """
+    # pylint: disable=import-outside-toplevel
+    from vbase import get_default_logger
+
+    for logger_name in (name, __package__):
+        get_default_logger(logger_name)
+
+
+@lru_cache(maxsize=1)
+def load_env(dotenv_path: str = ".env") -> Mapping[str, Optional[str]]:
+    """
+    Loads the environment variables from a .env file.
+    The file is parsed once per process and the result is reused by later calls.
+
+    :param dotenv_path: The .env file path.
+    :returns: The read-only environment variable dictionary.
+    """
+    return MappingProxyType(dict(dotenv_values(dotenv_path)))
+
+
+@lru_cache(maxsize=1024)
+def get_set_cid_for_dataset(dataset_name: str) -> str:
+    """
+    Returns the set CID for a named dataset.
+    Memoizes VBaseDataset.get_set_cid_for_dataset(),
+    since the same datasets are typically committed to repeatedly.
+
+    :param dataset_name: The dataset name.
+    :returns: The CID for the dataset.
+    """
+    # pylint: disable=import-outside-toplevel
+    from vbase import VBaseDataset
+
+    return VBaseDataset.get_set_cid_for_dataset(dataset_name)
+
+
+def get_vbase_client(dotenv_path: str = ".env") -> "VBaseClient":
+    """
+    Returns a vBase client initialized from a .env file.
+    Clients are cached by the .env path and modification time,
+    so that repeated calls reuse the client until the file changes.
+
+    :param dotenv_path: The .env file path.
+    :returns: The vBaseClient object.
+    """
+    try:
+        mtime_ns = os.stat(dotenv_path).st_mtime_ns
+    except OSError:
+        # The client falls back to the process environment variables.
+        mtime_ns = None
+    return _create_vbase_client(dotenv_path, mtime_ns)
+
+
+@lru_cache(maxsize=4)
+def _create_vbase_client(dotenv_path: str, mtime_ns: Optional[int]) -> "VBaseClient":
+    """
+    Creates a vBase client initialized from a .env file.
+
+    :param dotenv_path: The .env file path.
+    :param mtime_ns: The .env file modification time used as the cache key.
+    :returns: The vBaseClient object.
+    """
+    # pylint: disable=unused-argument,import-outside-toplevel
+    from vbase import VBaseClient
+
+    return VBaseClient.create_instance_from_env(dotenv_path)
+
+
+def check_env_var(env_vars_dict: Mapping[str, Optional[str]], env_var_name: str):
     """
     Checks that an environment variable is defined.
 
@@ -27,7 +216,7 @@ def check_env_var(env_vars_dict: Dict[str, Optional[str]], env_var_name: str):
 
 
 def get_s3_handle(
-    use_aws_access_key: bool = False, env_vars: Dict[str, Optional[str]] = None
+    use_aws_access_key: bool = False, env_vars: Mapping[str, Optional[str]] = None
 ) -> Any:
     """
     Constructs and returns an S3 handle for given settings.
@@ -37,6 +226,10 @@ def get_s3_handle(
     :param env_vars: The environment variable dictionary.
         Used iff use_aws_access_key is True.
     """
+    # pylint: disable=import-outside-toplevel
+    import boto3
+    from botocore.config import Config
+
     # Verify the access settings and create the S3 client.
     if use_aws_access_key:
         # Get Set AWS credentials from .env
@@ -47,36 +240,102 @@ def get_s3_handle(
             "s3",
             aws_access_key_id=env_vars["AWS_ACCESS_KEY_ID"],
             aws_secret_access_key=env_vars["AWS_SECRET_ACCESS_KEY"],
+            config=Config(**_S3_CLIENT_CONFIG),
         )
     assert env_vars is None
-    return boto3.client("s3")
+    return boto3.client("s3", config=Config(**_S3_CLIENT_CONFIG))
+
+
+def get_glob_literal_prefix(pattern: str) -> str:
+    """
+    Returns the literal prefix of a wildcard pattern,
+    the part of the pattern preceding the first wildcard character.
+    All keys matching the pattern start with this prefix,
+    so it can be used to narrow down S3 listings.
+
+    :param pattern: The wildcard pattern.
+    :returns: The literal prefix of the pattern.
+    """
+    for i, c in enumerate(pattern):
+        if c in "*?[":
+            return pattern[:i]
+    return pattern
 
 
 def get_all_matching_objects(
-    s3: Any, bucket: str, key_prefix: str = None
-) -> List[dict]:
+    s3: Any, bucket: str, key_prefix: str = None, key_pattern: str = None
+) -> Iterator[dict]:
     """
     Worker function that retrieves all objects from a bucket,
-    possibly using a key prefix.
+    possibly using a key prefix or a key wildcard pattern.
+    Objects are yielded as the listing pages are retrieved,
+    in the lexicographic key order S3 lists them in.
 
     :param s3: The AWS S3 boto client object.
     :param bucket: The S3 bucket containing the object.
     :param key_prefix: The key prefix if matching using the prefix.
-    :returns: The list of objects.
+    :param key_pattern: The key wildcard pattern if matching using the pattern.
+        If no key prefix is given, only keys starting with the literal prefix
+        of the pattern are listed.
+    :returns: The iterator over the objects.
     """
+    if key_pattern is not None:
+        if key_prefix is None:
+            key_prefix = get_glob_literal_prefix(key_pattern)
+        # Compile the pattern once rather than on each fnmatch() call
+        # and bind the match method outside the loop.
+        key_match = re.compile(fnmatch.translate(key_pattern)).match
+    else:
+        key_match = None
+
     paginator = s3.get_paginator("list_objects_v2")
     if key_prefix is not None:
         operation_parameters = {"Bucket": bucket, "Prefix": key_prefix}
     else:
         operation_parameters = {"Bucket": bucket}
     page_iterator = paginator.paginate(**operation_parameters)
-    all_objects = []
     for page in page_iterator:
-        if "Contents" in page:
-            all_objects.extend(page["Contents"])
-    # Keep non-trivial objects.
-    all_objects = [obj for obj in all_objects if obj["Size"] > 0]
-    return all_objects
+        # Keep non-trivial objects matching the pattern.
+        for obj in page.get("Contents", []):
+            if obj["Size"] > 0 and (key_match is None or key_match(obj["Key"])):
+                yield obj
+
+
+def prefetch(iterable: Iterable, maxsize: int) -> Iterator:
+    """
+    Iterates over an iterable on a background thread.
+    Up to maxsize items are produced ahead of the consumer,
+    so that a slow producer, such as a paged S3 listing,
+    overlaps with the processing of the items it has already produced.
+    Exceptions raised by the iterable are re-raised to the consumer.
+
+    :param iterable: The iterable to prefetch.
+    :param maxsize: The maximum number of items to produce ahead of the consumer.
+    :returns: The iterator over the items.
+    """
+    items = queue.Queue(maxsize=maxsize)
+
+    def _produce():
+        # Items are sent as (is_item, value) tuples.
+        # The final tuple carries the iterable exception, if any.
+        try:
+            for item in iterable:
+                items.put((True, item))
+        # pylint: disable=broad-except
+        except Exception as e:
+            items.put((False, e))
+        else:
+            items.put((False, None))
+
+    # Use a daemon thread so an abandoned iteration does not block the exit.
+    threading.Thread(target=_produce, daemon=True).start()
+    while True:
+        is_item, value = items.get()
+        if not is_item:
+            if value is not None:
+                raise value
+            return
+        yield value
 
 
 def read_s3_object(
@@ -93,25 +352,355 @@ def read_s3_object(
     :param key: The key for the object to be read.
     :param version_id: The version for the object to be read.
     :returns: The read object contents.
+    :raises botocore.exceptions.ClientError: If the object cannot be read.
     """
+    # pylint: disable=import-outside-toplevel
+    from boto3.s3.transfer import TransferConfig
 
-    # Read the file from the S3 bucket
-    file_content = ""
-    try:
-        _LOG.debug(
-            "s3.get_object(): Bucket=%s, Key=%s, VersionId=%s", bucket, key, version_id
-        )
-        if version_id is not None:
-            response = s3.get_object(Bucket=bucket, Key=key, VersionId=version_id)
-        else:
-            response = s3.get_object(Bucket=bucket, Key=key)
-        file_content = response["Body"].read().decode("utf-8")
-        _LOG.debug("Characters read: %d", len(file_content))
-    # pylint: disable=broad-except
-    except Exception as e:
-        _LOG.error("Error reading the object: %s", str(e))
+    # Read the file from the S3 bucket.
+    # Errors are raised to the caller rather than returning empty contents,
+    # so that failed reads are never hashed and committed.
+    _LOG.debug(
+        "s3.download_fileobj(): Bucket=%s, Key=%s, VersionId=%s",
+        bucket,
+        key,
+        version_id,
+    )
+    buffer = BytesIO()
+    s3.download_fileobj(
+        bucket,
+        key,
+        buffer,
+        ExtraArgs={"VersionId": version_id} if version_id is not None else None,
+        Config=TransferConfig(**_S3_TRANSFER_CONFIG),
+    )
+    file_content = buffer.getvalue().decode("utf-8")
+    _LOG.debug("Characters read: %d", len(file_content))
 
     if len(file_content) == 0:
         _LOG.error("Empty object")
 
     return file_content
+
+
+def read_s3_object_stream(
+    s3: Any,
+    bucket: str,
+    key: str,
+    version_id: Optional[str] = None,
+    if_match: Optional[str] = None,
+) -> Any:
+    """
+    Worker function returning the contents stream for a single S3 object.
+    The caller is responsible for closing the stream.
+
+    :param s3: The AWS S3 boto client object.
+    :param bucket: The S3 bucket containing the object.
+    :param key: The key for the object to be read.
+    :param version_id: The version for the object to be read.
+    :param if_match: The ETag the object must have, if any.
+    :returns: The botocore StreamingBody for the object contents.
+    :raises botocore.exceptions.ClientError: If the object cannot be read
+        or its ETag differs from if_match.
+    """
+    _LOG.debug(
+        "s3.get_object(): Bucket=%s, Key=%s, VersionId=%s, IfMatch=%s",
+        bucket,
+        key,
+        version_id,
+        if_match,
+    )
+    response = s3.get_object(**_get_object_args(bucket, key, version_id, if_match))
+    return response["Body"]
+
+
+def _get_object_args(
+    bucket: str, key: str, version_id: Optional[str], if_match: Optional[str]
+) -> dict:
+    """
+    Returns the s3.get_object() arguments for an object.
+
+    :param bucket: The S3 bucket containing the object.
+    :param key: The key for the object to be read.
+    :param version_id: The version for the object to be read.
+    :param if_match: The ETag the object must have, if any.
+    :returns: The s3.get_object() keyword arguments.
+    """
+    kwargs = {"Bucket": bucket, "Key": key}
+    if version_id is not None:
+        kwargs["VersionId"] = version_id
+    if if_match is not None:
+        kwargs["IfMatch"] = if_match
+    return kwargs
+
+
+def get_cid_for_stream(stream: Any) -> str:
+    """
+    Computes the object CID for a stream of string object contents.
+    The stream is hashed in chunks, so the contents are never fully materialized.
+    The result matches VBaseStringObject.get_cid_for_data()
+    for the string the stream contents decode to.
+
+    :param stream: The botocore StreamingBody with the object contents.
+    :returns: The object CID.
+    """
+    hash_obj = hashlib.sha3_256()
+    for chunk in stream.iter_chunks(_S3_READ_CHUNK_SIZE):
+        hash_obj.update(chunk)
+    return "0x" + hash_obj.hexdigest()
+
+
+def _read_s3_object_range(
+    s3: Any, get_object_args: dict, size: int, start: int
+) -> bytes:
+    """
+    Worker function returning a range of a single S3 object.
+
+    :param s3: The AWS S3 boto client object.
+    :param get_object_args: The s3.get_object() arguments for the object.
+    :param size: The expected object size.
+    :param start: The offset of the range.
+    :returns: The range contents.
+    :raises botocore.exceptions.ClientError: If the object cannot be read
+        or its ETag differs from the IfMatch argument.
+    :raises ValueError: If the object size differs from the expected size.
+    """
+    end = min(start + _S3_RANGE_SIZE, size) - 1
+    response = s3.get_object(Range=f"bytes={start}-{end}", **get_object_args)
+    if response["ContentRange"] != f"bytes {start}-{end}/{size}":
+        response["Body"].close()
+        raise ValueError(
+            f"Object size differs from the listed size: key = {get_object_args['Key']}, "
+            f"expected = {size}, range = {response['ContentRange']}"
+        )
+    try:
+        return response["Body"].read()
+    finally:
+        response["Body"].close()
+
+
+def _hash_next_range(hash_obj: Any, pending: deque):
+    """
+    Adds the next pending range to an object hash and releases its buffer.
+
+    :param hash_obj: The object hash.
+    :param pending: The futures of the ranges read ahead of the hash, in order.
+    """
+    try:
+        hash_obj.update(pending.popleft().result())
+    finally:
+        _S3_RANGE_BUFFERS.release()
+
+
+def read_s3_object_cid(
+    s3: Any,
+    bucket: str,
+    key: str,
+    version_id: Optional[str] = None,
+    obj: Optional[dict] = None,
+) -> str:
+    """
+    Worker function returning the object CID for a single S3 object.
+    Equivalent to hashing the read_s3_object() result
+    without holding the object contents in memory.
+
+    :param s3: The AWS S3 boto client object.
+    :param bucket: The S3 bucket containing the object.
+    :param key: The key for the object to be read.
+    :param version_id: The version for the object to be read.
+    :param obj: The listed object dictionary, if any.
+        The object is only read if it still has the listed ETag,
+        so that the CID is for the listed object contents
+        and may be cached by the listed ETag.
+        Objects larger than one range are read using concurrent ranged GETs.
+    :returns: The object CID.
+    :raises botocore.exceptions.ClientError: If the object cannot be read
+        or its ETag differs from the listed ETag.
+    :raises ValueError: If the object size differs from the listed size.
+    """
+    if_match = obj["ETag"] if obj is not None else None
+    if obj is None or obj["Size"] <= _S3_RANGE_SIZE:
+        stream = read_s3_object_stream(s3, bucket, key, version_id, if_match)
+        try:
+            return get_cid_for_stream(stream)
+        finally:
+            stream.close()
+
+    # A single GET is limited by the throughput of one connection.
+    # Large objects are read using concurrent ranged GETs
+    # and the ranges are hashed in order.
+    # Every range is read with the listed ETag,
+    # so that an object overwritten during the read fails
+    # rather than hashing ranges of different versions.
+    # At most _S3_RANGE_CONCURRENCY ranges of an object are pending,
+    # and the ranges pending across all objects are bounded by _S3_RANGE_BUFFERS.
+    size = obj["Size"]
+    _LOG.debug(
+        "Ranged s3.get_object(): Bucket=%s, Key=%s, VersionId=%s, IfMatch=%s, Size=%d",
+        bucket,
+        key,
+        version_id,
+        if_match,
+        size,
+    )
+    get_object_args = _get_object_args(bucket, key, version_id, if_match)
+    hash_obj = hashlib.sha3_256()
+    pending = deque()
+    try:
+        for start in range(0, size, _S3_RANGE_SIZE):
+            # Hash the pending ranges until a buffer is available.
+            # A read only waits for a buffer when it has no pending ranges,
+            # so that reads waiting for buffers never hold buffers.
+            # The buffers are released as the ranges are hashed.
+            # pylint: disable=consider-using-with
+            while len(pending) == _S3_RANGE_CONCURRENCY or not (
+                _S3_RANGE_BUFFERS.acquire(blocking=not pending)
+            ):
+                _hash_next_range(hash_obj, pending)
+            pending.append(
+                _S3_RANGE_EXECUTOR.submit(
+                    _read_s3_object_range, s3, get_object_args, size, start
+                )
+            )
+        while pending:
+            _hash_next_range(hash_obj, pending)
+    finally:
+        # Release the buffers of the abandoned ranges once their reads finish.
+        for future in pending:
+            future.cancel()
+            future.add_done_callback(lambda _: _S3_RANGE_BUFFERS.release())
+    return "0x" + hash_obj.hexdigest()
+
+
+def read_s3_object_metadata(
+    s3: Any,
+    bucket: str,
+    key: str,
+    version_id: Optional[str] = None,
+) -> dict:
+    """
+    Worker function returning the metadata for a single S3 object
+    without reading the object contents.
+
+    :param s3: The AWS S3 boto client object.
+    :param bucket: The S3 bucket containing the object.
+    :param key: The key for the object.
+    :param version_id: The version for the object.
+    :returns: The object metadata dictionary
+        with the same fields as the s3.list_objects_v2() objects.
+    """
+    _LOG.debug(
+        "s3.head_object(): Bucket=%s, Key=%s, VersionId=%s", bucket, key, version_id
+    )
+    if version_id is not None:
+        response = s3.head_object(Bucket=bucket, Key=key, VersionId=version_id)
+    else:
+        response = s3.head_object(Bucket=bucket, Key=key)
+    return {
+        "Key": key,
+        "ETag": response["ETag"],
+        "Size": response["ContentLength"],
+        "LastModified": response["LastModified"],
+    }
+
+
+def get_object_metadata_cid(obj: dict) -> str:
+    """
+    Computes the object CID for S3 object metadata rather than the object contents.
+    The CID covers the object key, ETag, size, and last modified time,
+    so the object integrity relies on the S3 ETag.
+    The CID is computed from the listed metadata without reads,
+    so metadata CIDs are not cached.
+
+    :param obj: The S3 object dictionary as returned by s3.list_objects_v2().
+    :returns: The object CID.
+    """
+    # pylint: disable=import-outside-toplevel
+    from vbase import VBaseStringObject
+
+    return VBaseStringObject.get_cid_for_data(
+        f"{obj['Key']}|{obj['ETag']}|{obj['Size']}|{obj['LastModified'].isoformat()}"
+    )
+
+
+def open_cid_cache(cache_path: str = CID_CACHE_PATH) -> sqlite3.Connection:
+    """
+    Opens the persistent cache of S3 object content CIDs,
+    creating the cache if necessary.
+    The cache maps S3 objects identified by their bucket, key, and ETag
+    to the CIDs of their contents.
+    An object that changes gets a new ETag, so stale entries are never matched.
+    The returned connection must only be used from the thread that opened it.
+
+    :param cache_path: The SQLite cache file path.
+    :returns: The cache database connection.
+    """
+    cache_dir = os.path.dirname(cache_path)
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+    conn = sqlite3.connect(cache_path)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS s3_object_cids ("
+        "bucket TEXT NOT NULL, key TEXT NOT NULL, etag TEXT NOT NULL, "
+        "cid TEXT NOT NULL, PRIMARY KEY (bucket, key, etag))"
+    )
+    return conn
+
+
+def get_cached_object_cid(
+    conn: sqlite3.Connection, bucket: str, obj: dict
+) -> Optional[str]:
+    """
+    Looks up the cached content CID for a listed S3 object.
+
+    :param conn: The cache database connection.
+    :param bucket: The S3 bucket containing the object.
+    :param obj: The S3 object dictionary with Key and ETag fields.
+    :returns: The cached CID or None if the object is not in the cache.
+    """
+    row = conn.execute(
+        "SELECT cid FROM s3_object_cids WHERE bucket = ? AND key = ? AND etag = ?",
+        (bucket, obj["Key"], obj["ETag"].strip('"')),
+    ).fetchone()
+    return row[0] if row is not None else None
+
+
+def get_cached_object_cids(
+    conn: sqlite3.Connection, bucket: str, objs: Iterable[dict]
+) -> Dict[str, str]:
+    """
+    Looks up the cached content CIDs for listed S3 objects.
+
+    :param conn: The cache database connection.
+    :param bucket: The S3 bucket containing the objects.
+    :param objs: The S3 object dictionaries with Key and ETag fields.
+    :returns: The dictionary mapping object keys to the cached CIDs
+        for the objects found in the cache.
+    """
+    cids = {}
+    for obj in objs:
+        cid = get_cached_object_cid(conn, bucket, obj)
+        if cid is not None:
+            cids[obj["Key"]] = cid
+    return cids
+
+
+def put_cached_object_cids(
+    conn: sqlite3.Connection, bucket: str, obj_cids: List[Tuple[dict, str]]
+):
+    """
+    Stores the content CIDs for listed S3 objects in the cache.
+
+    :param conn: The cache database connection.
+    :param bucket: The S3 bucket containing the objects.
+    :param obj_cids: The list of (S3 object dictionary, content CID) pairs.
+    """
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO s3_object_cids (bucket, key, etag, cid) "
+            "VALUES (?, ?, ?, ?)",
+            [
+                (bucket, obj["Key"], obj["ETag"].strip('"'), cid)
+                for obj, cid in obj_cids
+            ],
+        )
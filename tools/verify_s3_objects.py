@@ -3,30 +3,35 @@ Verifies validityBase (vBase) commitments for one or more S3 objects.
 """
 
 import argparse
-import fnmatch
+from concurrent.futures import Future, ThreadPoolExecutor
 import json
 import logging
+from operator import itemgetter
 import pprint
-from typing import Dict, List, Optional
-from dotenv import dotenv_values
-import pandas as pd
-
-from vbase import (
-    get_default_logger,
-    VBaseClient,
-    VBaseDataset,
-    VBaseStringObject,
-    Web3HTTPIndexingService,
-)
+import sqlite3
+from typing import TYPE_CHECKING, Any, List, Mapping, Optional, Tuple
 
 from tools.utils import (
+    S3_READ_CONCURRENCY,
+    configure_logging,
     get_s3_handle,
     get_all_matching_objects,
-    read_s3_object,
+    get_cached_object_cid,
+    get_object_metadata_cid,
+    get_set_cid_for_dataset,
+    get_vbase_client,
+    load_env,
+    open_cid_cache,
+    prefetch,
+    put_cached_object_cids,
+    read_s3_object_cid,
 )
 
+if TYPE_CHECKING:
+    import numpy as np
+
 
-_LOG = get_default_logger(__name__)
+_LOG = logging.getLogger(__name__)
 _LOG.setLevel(logging.INFO)
 
 
@@ -83,6 +88,48 @@ If supplied, objects matching the wildcard pattern will be used to verify commit
         help="""
 use AWS authentication: If specified, AWS Access Key defined in .env will be used. 
 In this case, .env must define AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY variables.
+""",
+    )
+    parser.add_argument(
+        "--use_etag",
+        required=False,
+        action="store_true",
+        help="""
+verify object metadata: If specified, the object key, ETag, size, and last modified time
+are verified instead of the object contents.
+Use this option for datasets committed using commit_s3_objects --use_etag.
+Objects are not downloaded.
+""",
+    )
+    parser.add_argument(
+        "--use_cid_cache",
+        required=False,
+        action="store_true",
+        help="""
+cache object hashes: If specified, object content hashes are cached locally
+by object key and ETag, and unchanged objects are not downloaded again.
+The cache is shared with commit_s3_objects.
+The cache file may be set using the VBASE_CID_CACHE environment variable.
+""",
+    )
+    parser.add_argument(
+        "--sort_by_key",
+        required=False,
+        action="store_true",
+        help="""
+match objects in key order: If specified, objects are matched to commitments
+in the key order S3 lists them in rather than by their last modified times.
+Use this option for datasets whose keys sort in the order the objects were committed,
+for instance, keys that embed ISO 8601 dates.
+""",
+    )
+    parser.add_argument(
+        "--fail_fast",
+        required=False,
+        action="store_true",
+        help="""
+stop at the first failure: If specified, verification stops at the first
+mismatched object, and the remaining objects are not read.
 """,
     )
     parser.add_argument(
@@ -101,9 +148,198 @@ examples:
     return parser
 
 
+def _list_objects(
+    s3: Any,
+    args: argparse.Namespace,
+    executor: ThreadPoolExecutor,
+    cid_cache: Optional[sqlite3.Connection],
+) -> List[tuple]:
+    """
+    Lists the S3 objects to verify and submits the reads of their contents.
+
+    :param s3: The AWS S3 boto client object.
+    :param args: The command arguments.
+    :param executor: The executor reading the objects.
+    :param cid_cache: The optional cache of object content CIDs
+        opened using open_cid_cache().
+        Objects with cached CIDs are not read.
+        Objects are not read if verifying the object metadata.
+    :returns: The list of entries holding the object's last modified time,
+        the object, and either its cached CID or its read future.
+        The entries are sorted by time, unless matching in the listed key order.
+    """
+
+    def _fetch_and_hash(obj: dict) -> str:
+        return read_s3_object_cid(s3, args.bucket, obj["Key"], obj=obj)
+
+    # List the S3 objects matching the given prefix or pattern.
+    # Object reads are submitted as the objects are listed.
+    entries = []
+    for obj in prefetch(
+        get_all_matching_objects(
+            s3=s3,
+            bucket=args.bucket,
+            key_prefix=args.key_prefix,
+            key_pattern=args.key_pattern,
+        ),
+        # Buffer up to one listing page.
+        maxsize=1000,
+    ):
+        if args.use_etag:
+            # Get object hash for the listed object metadata.
+            object_cid = get_object_metadata_cid(obj)
+        elif cid_cache is not None:
+            object_cid = get_cached_object_cid(cid_cache, args.bucket, obj)
+        else:
+            object_cid = None
+        future = None
+        if object_cid is None:
+            future = executor.submit(_fetch_and_hash, obj)
+        entries.append((obj["LastModified"], obj, object_cid, future))
+
+    # The sort needs the complete listing, but the reads are already running.
+    if not args.sort_by_key:
+        entries.sort(key=itemgetter(0))
+    return entries
+
+
+def _collect_object_hashes(
+    entries: List[tuple], expected_cids: Optional[List[str]]
+) -> Tuple["np.ndarray", List[Tuple[dict, str]], List[str]]:
+    """
+    Collects the object hashes in the order of the listed entries.
+
+    :param entries: The entries returned by _list_objects().
+    :param expected_cids: The committed object CIDs, if failing fast.
+        Reading stops at the first object that fails verification,
+        and mismatched numbers of objects and commitments
+        fail verification without reading any objects.
+    :returns: A tuple comprising the object hashes,
+        the (object, CID) pairs for the objects read,
+        and the messages for the objects that could not be read.
+    """
+    # pylint: disable=import-outside-toplevel
+    import numpy as np
+
+    stop = expected_cids is not None and len(expected_cids) != len(entries)
+    # Preallocate the hashes for the vectorized comparison.
+    hashes = np.empty(len(entries), dtype=object)
+    read_cids = []
+    errors = []
+    for i, (_, obj, object_cid, future) in enumerate(entries):
+        if stop:
+            # Cancel the reads that have not started.
+            if future is not None:
+                future.cancel()
+            continue
+        if future is not None:
+            try:
+                object_cid = future.result()
+            # pylint: disable=broad-except
+            except Exception as e:
+                errors.append(
+                    f'Error reading object: key = {obj["Key"]}, error = {str(e)}'
+                )
+                stop = expected_cids is not None
+                continue
+            read_cids.append((obj, object_cid))
+        hashes[i] = object_cid
+        if expected_cids is not None and object_cid != expected_cids[i]:
+            stop = True
+    return hashes, read_cids, errors
+
+
+def _get_object_hashes(
+    s3: Any, args: argparse.Namespace, commitment_future: Future
+) -> Tuple[List[dict], "np.ndarray", List[str]]:
+    """
+    Lists the S3 objects to verify and computes their hashes.
+
+    :param s3: The AWS S3 boto client object.
+    :param args: The command arguments.
+    :param commitment_future: The future for the dataset commitment receipts.
+        Only waited for when failing fast.
+    :returns: A tuple comprising the objects in verification order,
+        their hashes, and the messages for the objects that could not be read.
+    """
+    # The cache is only accessed from this thread.
+    cid_cache = open_cid_cache() if args.use_cid_cache and not args.use_etag else None
+    try:
+        with ThreadPoolExecutor(max_workers=S3_READ_CONCURRENCY) as executor:
+            entries = _list_objects(s3, args, executor, cid_cache)
+            objs = [obj for _, obj, _, _ in entries]
+            # Formatting large listings is expensive,
+            # so only format them for debugging.
+            if _LOG.isEnabledFor(logging.DEBUG):
+                _LOG.debug("s3.list_objects_v2(): objects = %s", pprint.pformat(objs))
+
+            expected_cids = None
+            if args.fail_fast:
+                # Compare the hashes to the commitments as they are collected.
+                expected_cids = [
+                    receipt["objectCid"] for receipt in commitment_future.result()
+                ]
+            hashes, read_cids, errors = _collect_object_hashes(entries, expected_cids)
+        if cid_cache is not None and read_cids:
+            put_cached_object_cids(cid_cache, args.bucket, read_cids)
+    finally:
+        if cid_cache is not None:
+            cid_cache.close()
+    return objs, hashes, errors
+
+
+def _compare_object_hashes(
+    objs: List[dict],
+    hashes: "np.ndarray",
+    commitment_receipts: List[dict],
+    fail_fast: bool,
+) -> List[str]:
+    """
+    Compares the S3 objects to the dataset commitments.
+
+    :param objs: The objects in verification order.
+    :param hashes: The object hashes.
+    :param commitment_receipts: The commitment receipts in the same order.
+    :param fail_fast: If True, only report the first mismatched entry.
+    :returns: The messages for the mismatched entries.
+    """
+    # pylint: disable=import-outside-toplevel
+    import numpy as np
+    import pandas as pd
+
+    # Compare all object and commitment hashes and timestamps at once,
+    # and only format messages for the mismatched entries.
+    hash_mismatches = hashes != np.array(
+        [receipt["objectCid"] for receipt in commitment_receipts], dtype=object
+    )
+    ts = pd.to_datetime([obj["LastModified"] for obj in objs], utc=True)
+    commitment_ts = pd.to_datetime(
+        [receipt["timestamp"] for receipt in commitment_receipts], utc=True
+    )
+    # Verify that each commitment follows the object timestamp.
+    ts_mismatches = np.asarray(commitment_ts < ts)
+
+    validation_log = []
+    for i in np.flatnonzero(hash_mismatches | ts_mismatches):
+        _LOG.debug("Mismatched entry: key = %s", objs[i]["Key"])
+        if hash_mismatches[i]:
+            validation_log.append(
+                f"Mismatched entry: index = {i}, S3 object hash = {hashes[i]}, "
+                f'commitment object hash = {commitment_receipts[i]["objectCid"]}'
+            )
+        if ts_mismatches[i]:
+            validation_log.append(
+                f"Mismatched entry timestamps: index = {i}, S3 object timestamp = {ts[i]}, "
+                f'commitment object timestamp = {commitment_receipts[i]["timestamp"]}'
+            )
+        if fail_fast:
+            break
+    return validation_log
+
+
 def verify_s3_objects(
     args: argparse.Namespace,
-    env_vars: Dict[str, Optional[str]],
+    env_vars: Mapping[str, Optional[str]],
 ) -> (bool, List[str]):
     """
     Worker function processing the args to execute the task.
@@ -114,36 +350,34 @@ def verify_s3_objects(
     :returns: A tuple comprising the status and the log:
         True if verification succeeded; False otherwise.
         A list of verification messages if any failures were encountered.
+    :raises ValueError: If the arguments do not select the objects to verify
+        or the vBase client has no default user.
     """
+    # pylint: disable=import-outside-toplevel
+    from vbase import Web3HTTPIndexingService
+
     print(f"Verifying S3 objects: {json.dumps(vars(args))}")
 
     if args.verbose:
         _LOG.setLevel(logging.DEBUG)
 
     # Verify the key settings.
-    if (
-        sum(
-            [
-                args.key_prefix is not None,
-                args.key_pattern is not None,
-            ]
-        )
-        != 1
-    ):
-        _LOG.error(
+    if (args.key_prefix is None) == (args.key_pattern is None):
+        raise ValueError(
             "Exactly one of the arguments --key_prefix or --key_pattern must be provided."
         )
 
     # Static configuration such as S3 credentials and vBase access parameters
     # are stored in the .env file.
     s3 = get_s3_handle(args.use_aws_access_key, env_vars)
-    vbc = VBaseClient.create_instance_from_env(".env")
+    vbc = get_vbase_client(".env")
 
-    set_cid = VBaseDataset.get_set_cid_for_dataset(args.dataset_name)
+    set_cid = get_set_cid_for_dataset(args.dataset_name)
 
     # Verify the dataset.
     user_address = vbc.get_default_user()
-    assert user_address is not None
+    if user_address is None:
+        raise ValueError("The vBase client has no default user.")
 
     # Record verification failure messages into a log to return to the caller.
     status = False
@@ -160,44 +394,34 @@ def verify_s3_objects(
         )
         return status, validation_log
 
-    # Process all dataset commitments and reconcile them against the objects.
-    # Retrieve the S3 objects.
-    assert args.key_prefix or args.key_pattern
-    if args.key_prefix:
-        # List the S3 objects with the given prefix.
-        objs = get_all_matching_objects(
-            s3=s3, bucket=args.bucket, key_prefix=args.key_prefix
-        )
-    else:
-        assert args.key_pattern
-        # List all S3 objets in the bucket.
-        objs = get_all_matching_objects(s3=s3, bucket=args.bucket)
-        # Match the pattern.
-        objs = [obj for obj in objs if fnmatch.fnmatch(obj["Key"], args.key_pattern)]
-
-    # Sort the objects by time.
-    objs.sort(key=lambda x: x["LastModified"])
-    _LOG.debug("s3.list_objects_v2(): objects = %s", pprint.pformat(objs))
-
-    # Get object hashes.
-    hashes = []
-    ts = []
-    for obj in objs:
-        data = read_s3_object(s3=s3, bucket=args.bucket, key=obj["Key"])
-        hashes.append(VBaseStringObject.get_cid_for_data(data))
-        ts.append(pd.Timestamp(obj["LastModified"]))
-
-    # Query all commitments and sort by time.
-    # TODO: Add support for forwarder indexing service.
-    # Currently, the tool requires a direct Web3 node connection to query for events.
-    commitment_receipts = (
-        Web3HTTPIndexingService.create_instance_from_env_json_descriptor(
+    def _find_commitments() -> List[dict]:
+        # Query all commitments and sort by time.
+        # TODO: Add support for forwarder indexing service.
+        # Currently, the tool requires a direct Web3 node connection
+        # to query for events.
+        return Web3HTTPIndexingService.create_instance_from_env_json_descriptor(
             ".env"
         ).find_user_set_objects(
-            user=vbc.get_default_user(),
-            set_cid=VBaseDataset.get_set_cid_for_dataset(args.dataset_name),
+            user=user_address,
+            set_cid=set_cid,
         )
-    )
+
+    # Query the commitments on a separate thread
+    # while the S3 objects are listed and read,
+    # so that the node RPC latency overlaps with the S3 reads.
+    commitment_executor = ThreadPoolExecutor(max_workers=1)
+    commitment_future = commitment_executor.submit(_find_commitments)
+    # Release the thread once the query completes.
+    commitment_executor.shutdown(wait=False)
+
+    # Process all dataset commitments and reconcile them against the objects.
+    # Retrieve the S3 objects and their hashes.
+    objs, hashes, validation_log = _get_object_hashes(s3, args, commitment_future)
+    if len(validation_log) > 0:
+        return status, validation_log
+
+    # Wait for the commitments queried while the objects were read.
+    commitment_receipts = commitment_future.result()
 
     # Objects and commitments should match 1-1.
     if len(hashes) != len(commitment_receipts):
@@ -206,21 +430,10 @@ def verify_s3_objects(
             f"commitments = {len(commitment_receipts)}"
         )
         return status, validation_log
-    for i, obj in enumerate(objs):
-        _LOG.debug("Validating: key = %s", obj["Key"])
-        # Verify that there is a commitment with object data that follows the object timestamp.
-        if commitment_receipts[i]["objectCid"] != hashes[i]:
-            validation_log.append(
-                f"Mismatched entry: index = {i}, S3 object hash = {hashes[i]}, "
-                f'commitment object hash = {commitment_receipts[i]["objectCid"]}'
-            )
-        if pd.Timestamp(commitment_receipts[i]["timestamp"]) - ts[i] < pd.Timedelta(
-            "0 days"
-        ):
-            validation_log.append(
-                f"Mismatched entry timestamps: index = {i}, S3 object timestamp = {ts[i]}, "
-                f'commitment object timestamp = {commitment_receipts[i]["timestamp"]}'
-            )
+
+    validation_log = _compare_object_hashes(
+        objs, hashes, commitment_receipts, args.fail_fast
+    )
 
     # If we found no mismatches, the check succeeded.
     if len(validation_log) == 0:
@@ -235,7 +448,16 @@ def main():
     """
     parser = build_argument_parser()
     args = parser.parse_args()
-    verify_s3_objects(args, dotenv_values(".env"))
+
+    # Verify the key settings.
+    # Fail before any S3 or vBase connections are made.
+    if (args.key_prefix is None) == (args.key_pattern is None):
+        parser.error(
+            "Exactly one of the arguments --key_prefix or --key_pattern must be provided."
+        )
+
+    configure_logging(__name__)
+    verify_s3_objects(args, load_env())
 
 
 if __name__ == "__main__":